@@ -0,0 +1,320 @@
+###
+### Streams saved games (.gmk, as written by Logic.saveGame()) through the AI
+### and reports win rates, without a display.
+###
+### Every save goes through a pipeline of generators:
+###     readSaves()   finds .gmk files in folders, .zip and .tar archives,
+###                   reading one file at a time.
+###     analyseSave() parses and validates the save, replays it (finds a win
+###                   already on the board) and otherwise lets the AI play
+###                   both sides from there to a result.
+###     boundedMap()  runs analyseSave() on worker processes with at most
+###                   --in-flight saves submitted at once.
+###     Stats         counts results by dimension, diff and move count.
+### Only counters are kept, so memory stays flat however many saves there are.
+### A summary line is printed every --every saves, and the tables at the end.
+###
+###     Usage: python gomoku_Analyse.py PATH [PATH ...] [--workers W]
+###                [--in-flight N] [--think S] [--human-diff D] [--every N]
+###
+
+import argparse
+import os
+import time
+from gomoku_Logic import Logic
+
+RESULTS = ["win", "loss", "draw", "unfinished"] # From the human's side.
+
+
+#> Yields (name, text, error) for every .gmk save under the given paths,
+#  which may be .gmk files, folders (searched recursively) or .zip / .tar(.gz)
+#  archives. Saves are read as bytes and decoded as ASCII, with any other
+#  byte replaced, like the archive members.
+#> A file or archive which cannot be read is yielded once with text None and
+#  the reason in error, so it counts as an invalid save instead of ending the run.
+#> The archive modules are only imported for archives, as they are slow to load.
+def readSaves(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for folder, subFolders, fileNames in os.walk(path):
+                subFolders.sort()
+                for fileName in sorted(fileNames):
+                    if fileName.endswith(".gmk"):
+                        yield from readSaves([os.path.join(folder, fileName)])
+        elif path.endswith(".zip"):
+            import zipfile
+            try:
+                archive = zipfile.ZipFile(path)
+                for info in archive.infolist():
+                    if info.filename.endswith(".gmk"):
+                        text = archive.read(info).decode("ascii", "replace")
+                        yield path + ":" + info.filename, text, None
+                archive.close()
+            except (OSError, zipfile.BadZipFile) as error:
+                yield path, None, "unreadable: " + str(error)
+        elif path.endswith((".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")):
+            import tarfile
+            try:
+                archive = tarfile.open(path, "r:*") # Members are read as the stream goes.
+                for member in archive:
+                    if member.isfile() and member.name.endswith(".gmk"):
+                        saveFile = archive.extractfile(member)
+                        text = saveFile.read().decode("ascii", "replace")
+                        yield path + ":" + member.name, text, None
+                    archive.members = [] # Keeps the member list from growing.
+                archive.close()
+            except (OSError, tarfile.TarError) as error:
+                yield path, None, "unreadable: " + str(error)
+        else:
+            try:
+                saveFile = open(path, "rb")
+                text = saveFile.read().decode("ascii", "replace")
+                saveFile.close()
+            except OSError as error:
+                yield path, None, "unreadable: " + str(error)
+                continue
+            yield path, text, None
+
+
+#> Returns the piece which has a winning series on the board as
+#  [piece, [start, end]], or None if neither side has won.
+def findWinner(game):
+    for col in range(game.dimension):
+        for row in range(game.dimension):
+            piece = game.state[col][row]
+            if piece != game.BLANK:
+                winResult = game.checkWin(col, row, piece)
+                if winResult != None:
+                    return [piece, winResult]
+    return None
+
+
+#> Checks that the position could come from a real game: black moves first,
+#  so black has as many pieces as white or one more, and at most one side
+#  has won. Raises ValueError if not.
+def validatePosition(game):
+    black = 0
+    white = 0
+    for column in game.state:
+        black += column.count("B")
+        white += column.count("W")
+    if black - white not in [0, 1]:
+        raise ValueError("impossible piece counts: " + str(black) + " black, " +
+                         str(white) + " white")
+    winners = set()
+    for col in range(game.dimension):
+        for row in range(game.dimension):
+            piece = game.state[col][row]
+            if piece != game.BLANK and game.checkWin(col, row, piece) != None:
+                winners.add(piece)
+    if len(winners) > 1:
+        raise ValueError("both sides have five in a row")
+
+
+#> Plays the game on from its saved position with the AI on both sides: the
+#  computer at the save's diff and the human at humanDiff.
+#> Returns the winner's piece, "draw", or None if maxMoves ran out first.
+def playOut(game, humanDiff, think, maxMoves):
+    diffs = {game.human: humanDiff, game.comp: game.diff}
+    # Black moves first, so the piece counts say whose turn it is.
+    black = sum(column.count("B") for column in game.state)
+    white = sum(column.count("W") for column in game.state)
+    if black > white:
+        game.player = "W"
+    else:
+        game.player = "B"
+    game.rebuildIndexes()
+
+    for moveNum in range(maxMoves):
+        if game.isDraw():
+            return "draw"
+        piece = game.player
+        if game.comp != piece: # The side to move is always the "computer".
+            game.human, game.comp = game.comp, game.human
+        game.diff = diffs[piece]
+        if game.diff == 0: # An AI which never moves cannot finish the game.
+            return None
+        game.playPatterns = game.patternConverter()
+
+        choice = game.decisionMaker(think)
+        if choice == []:
+            return "draw"
+        game.play(choice[0], choice[1])
+        if game.checkWin(choice[0], choice[1], piece) != None:
+            return piece
+    return None
+
+
+#> Runs one save through parse, validate, replay and evaluate.
+#> Returns a dict with its name, dimension, diff, move count (pieces on the
+#  board at the end) and result, or with an "error" if the save is invalid
+#  or could not be read (readError).
+def analyseSave(job):
+    name, text, readError, humanDiff, think, maxMoves = job
+    if readError is not None:
+        return {"name": name, "error": readError}
+    game = Logic(5)
+    try:
+        game.restoreGame(text)
+        validatePosition(game)
+    except ValueError as error:
+        return {"name": name, "error": str(error)}
+
+    human = game.human
+    record = {"name": name, "dimension": game.dimension, "diff": game.diff}
+    winner = findWinner(game)
+    if winner != None:
+        winner = winner[0]
+    elif game.isDraw():
+        winner = "draw"
+    else:
+        winner = playOut(game, humanDiff, think, maxMoves)
+
+    if winner == None:
+        record["result"] = "unfinished"
+    elif winner == "draw":
+        record["result"] = "draw"
+    elif winner == human:
+        record["result"] = "win"
+    else:
+        record["result"] = "loss"
+    record["moves"] = game.dimension*game.dimension - game.emptyCount
+    return record
+
+
+#> Yields func(item) for every item, in the order they finish, with at most
+#  inFlight items submitted to the pool at once. Items are only read from the
+#  iterator as room frees up. With one worker everything runs in this process.
+def boundedMap(func, items, workers, inFlight):
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    # Imported here: it pulls in multiprocessing, which a single worker never needs.
+    from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+    pool = ProcessPoolExecutor(workers)
+    try:
+        pending = set()
+        for item in items:
+            pending.add(pool.submit(func, item))
+            if len(pending) >= inFlight:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while len(pending) != 0:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+class Stats:
+    #> Counts results by dimension, diff and move count (in buckets of
+    #  bucketSize moves), plus the reasons saves were rejected.
+    def __init__(self, bucketSize=10):
+        self.bucketSize = bucketSize
+        self.total = 0
+        self.results = dict.fromkeys(RESULTS, 0)
+        self.groups = {"dimension": {}, "diff": {}, "moves": {}} # key -> result counts
+        self.errors = {}
+
+
+    def add(self, record):
+        self.total += 1
+        if "error" in record:
+            reason = record["error"].split(":")[0]
+            self.errors[reason] = self.errors.get(reason, 0) + 1
+            return
+        result = record["result"]
+        self.results[result] += 1
+        bucket = record["moves"] // self.bucketSize * self.bucketSize
+        for group, key in [("dimension", record["dimension"]), ("diff", record["diff"]),
+                           ("moves", bucket)]:
+            counts = self.groups[group].setdefault(key, dict.fromkeys(RESULTS, 0))
+            counts[result] += 1
+
+
+    #> Returns the human's win rate in a set of result counts, as a percentage
+    #  of the finished games.
+    def winRate(self, counts):
+        finished = counts["win"] + counts["loss"] + counts["draw"]
+        if finished == 0:
+            return 0.0
+        return 100 * counts["win"] / finished
+
+
+    #> Returns a one-line summary of everything counted so far.
+    def summary(self):
+        line = str(self.total) + " saves"
+        for result in RESULTS:
+            line = line + ", " + str(self.results[result]) + " " + result
+        line = line + ", " + str(sum(self.errors.values())) + " invalid"
+        return line + ", human win rate " + str(round(self.winRate(self.results), 1)) + "%"
+
+
+    #> Returns the per-group tables as a list of lines.
+    def tables(self):
+        lines = []
+        for group in ["dimension", "diff", "moves"]:
+            lines.append("by " + group + ":")
+            for key in sorted(self.groups[group]):
+                counts = self.groups[group][key]
+                label = str(key)
+                if group == "moves":
+                    label = str(key) + "-" + str(key + self.bucketSize - 1)
+                lines.append("  " + label.ljust(8) + " " +
+                             " ".join(str(counts[result]).rjust(6) for result in RESULTS) +
+                             "  win rate " + str(round(self.winRate(counts), 1)) + "%")
+        if len(self.errors) != 0:
+            lines.append("invalid saves:")
+            for reason in sorted(self.errors):
+                lines.append("  " + reason + ": " + str(self.errors[reason]))
+        return lines
+
+
+#> Yields the Stats after every record, so callers can report as they go.
+def aggregate(records, stats):
+    for record in records:
+        stats.add(record)
+        yield stats, record
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyse saved Gomoku games")
+    parser.add_argument("paths", nargs="+", help=".gmk files, folders, .zip or .tar archives")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--in-flight", type=int, default=None,
+                        help="most saves submitted at once (default 4 per worker)")
+    parser.add_argument("--think", type=float, default=Logic.SELFPLAYTIMELIMIT)
+    parser.add_argument("--human-diff", type=int, default=3,
+                        help="difficulty the AI plays the human's side at")
+    parser.add_argument("--max-moves", type=int, default=400,
+                        help="moves played on from a save before it counts as unfinished")
+    parser.add_argument("--every", type=int, default=100, help="print a summary every N saves")
+    args = parser.parse_args(argv)
+    if args.every < 1:
+        parser.error("--every must be at least 1")
+
+    inFlight = args.in_flight
+    if inFlight is None:
+        inFlight = 4 * args.workers
+    jobs = ((name, text, readError, args.human_diff, args.think, args.max_moves)
+            for name, text, readError in readSaves(args.paths))
+
+    start = time.perf_counter()
+    stats = Stats()
+    for stats, record in aggregate(boundedMap(analyseSave, jobs, args.workers, inFlight), stats):
+        if "error" in record:
+            print("invalid " + record["name"] + ": " + record["error"])
+        if stats.total % args.every == 0:
+            print(stats.summary(), flush=True)
+    print(stats.summary())
+    for line in stats.tables():
+        print(line)
+    print(str(round(time.perf_counter() - start, 2)) + " s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+#> Saving without blocking the game.
+#> AutoSaver hands save files to one background writer thread. Each file only
+#  keeps its newest pending text, and the writer waits a short moment before
+#  writing, so a burst of moves turns into a single write.
+#> Every write goes to a temporary file which is then renamed over the save,
+#  so a crash leaves either the old save or the new one, never half of one.
+#  The checkpoint being replaced is kept as <path>.1, and findCheckpoint()
+#  falls back on it if the newest one does not load.
+
+import atexit
+import os
+import tempfile
+import threading
+import time
+
+REMOVE = None # Pending "text" which deletes the checkpoint (e.g. a finished game).
+
+
+#> Writes text to path by way of a temporary file in the same folder and an
+#  atomic rename. Each call has its own temporary file, so concurrent writers
+#  cannot mix. With fsync, the data and the rename reach the disk before
+#  this returns.
+#> With keepPrevious, the file being replaced is first renamed to <path>.1.
+def writeAtomic(path, text, fsync=True, keepPrevious=False):
+    folder = os.path.dirname(path)
+    if folder != "":
+        os.makedirs(folder, exist_ok=True)
+    tempFd, tempPath = tempfile.mkstemp(dir=folder or ".", prefix=os.path.basename(path) + ".",
+                                        suffix=".tmp")
+    try:
+        saved = os.fdopen(tempFd, "w")
+        saved.write(text)
+        saved.flush()
+        if fsync:
+            os.fsync(saved.fileno())
+        saved.close()
+        if keepPrevious and os.path.exists(path):
+            os.replace(path, path + ".1")
+        os.replace(tempPath, path)
+    except BaseException: # Leaves no temporary file behind.
+        if os.path.exists(tempPath):
+            os.remove(tempPath)
+        raise
+    if fsync and os.name != "nt": # Makes the rename itself durable.
+        folderFd = os.open(folder or ".", os.O_RDONLY)
+        try:
+            os.fsync(folderFd)
+        finally:
+            os.close(folderFd)
+
+
+#> Returns the text of the save at path, decoded as ASCII with any other
+#  byte replaced, or None if it cannot be read.
+def readSave(path):
+    try:
+        loaded = open(path, "rb")
+        text = loaded.read().decode("ascii", "replace")
+        loaded.close()
+    except OSError:
+        return None
+    return text
+
+
+#> Returns the text of the checkpoint at path, or of the previous one
+#  (<path>.1) if that one is not good, where isGood(text) decides.
+#> Returns None if neither is good.
+#> Checkpoints are read as bytes and decoded as ASCII with any other byte
+#  replaced, so a damaged file is judged by isGood() instead of raising.
+def findCheckpoint(path, isGood):
+    for candidate in [path, path + ".1"]:
+        text = readSave(candidate)
+        if text is None:
+            continue
+        if isGood(text):
+            return text
+    return None
+
+
+class AutoSaver:
+    #> delay is how long (in seconds) the writer waits for more saves before
+    #  writing; fsync is passed on to writeAtomic().
+    #> The thread is only started by the first submit(), so games which never
+    #  save (headless ones) cost nothing.
+    def __init__(self, delay=0.5, fsync=True):
+        self.delay = delay
+        self.fsync = fsync
+        self.pending = {} # path -> [newest text (or REMOVE), keepPrevious] not yet written.
+        self.written = {} # path -> text last written, to skip unchanged saves.
+        self.condition = threading.Condition()
+        self.thread = None
+        self.closing = False
+        self.registered = False # Whether close() is registered to run at exit.
+        self.errors = 0
+
+
+    #> Queues text to be written to path and returns at once. Replaces any
+    #  text still waiting for the same path.
+    #> keepPrevious keeps the replaced file as <path>.1 (for checkpoints).
+    def submit(self, path, text, keepPrevious=False):
+        with self.condition:
+            self.pending[path] = [text, keepPrevious]
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+                self.thread.start()
+                if not self.registered: # Pending saves are still written on exit.
+                    atexit.register(self.close)
+                    self.registered = True
+            self.condition.notify()
+
+
+    #> Queues removal of the checkpoint at path (and its previous copy).
+    def discard(self, path):
+        self.submit(path, REMOVE)
+
+
+    #> Writes everything still pending and stops the thread.
+    def close(self):
+        with self.condition:
+            self.closing = True
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.closing = False
+
+
+    #> Thread body: waits for saves, lets bursts settle for delay seconds, then
+    #  writes the newest text of each path.
+    def run(self):
+        while True:
+            with self.condition:
+                while len(self.pending) == 0 and not self.closing:
+                    self.condition.wait()
+                # Coalesces rapid saves: later submits replace the pending text.
+                deadline = time.monotonic() + self.delay
+                while not self.closing and time.monotonic() < deadline:
+                    self.condition.wait(deadline - time.monotonic())
+                batch = self.pending
+                self.pending = {}
+                closing = self.closing
+            for path, (text, keepPrevious) in batch.items():
+                self.write(path, text, keepPrevious)
+            if closing:
+                with self.condition:
+                    if len(self.pending) == 0:
+                        return
+
+
+    def write(self, path, text, keepPrevious):
+        if path in self.written and self.written[path] == text:
+            return
+        try:
+            if text is REMOVE:
+                for oldPath in [path, path + ".1"]:
+                    if os.path.exists(oldPath):
+                        os.remove(oldPath)
+            else:
+                writeAtomic(path, text, self.fsync, keepPrevious)
+            self.written[path] = text
+        except OSError:
+            self.errors += 1 # The game carries on; the next save tries again.
@@ -0,0 +1,196 @@
+###
+### Batched AI evaluation with NumPy.
+###
+### Chooses the AI's move for N independent positions at once. Positions are
+### stacked as an (N, dimension, dimension) int8 array of Board cell codes,
+### indexed [board, col, row]. Pattern detection is done for the whole batch
+### with array operations, one pattern at a time, instead of N separate calls
+### to Logic.decisionMaker().
+###
+### The move priorities are the ones used by Logic.lookUpPatterns(): the lowest
+### pattern index wins, and ties go to the lowest col, then row. On "easy"
+### (diff 1) a random match is chosen instead. Positions with no pattern match
+### fall back to a random empty spot next to a piece (the centre on an empty
+### board), which approximates Logic.pseudoRandomPlay().
+###
+
+import numpy as np
+from gomoku_Board import Board
+from gomoku_Logic import Logic
+
+# Relative codes used for matching: blank, computer ("C") and player ("P").
+# Cells outside the board are padded with OFFBOARD so they never match.
+RELCODES = {"X": 0, "C": 1, "P": 2}
+OFFBOARD = 3
+# Line directions as (difCol, difRow): vertical, horizontal and both diagonals.
+DIRECTIONS = [(0, 1), (1, 0), (1, -1), (1, 1)]
+
+
+#> Returns the generalized pattern list for a difficulty, as patternConverter()
+#  orders them: each pattern followed by its reverse unless it is a palindrome.
+#> selectedPats overrides the class pattern list (e.g. a ranking being tuned).
+def orderedPatterns(diff, selectedPats=None):
+    if selectedPats is None:
+        if diff == 0:
+            selectedPats = Logic.NOPATS
+        elif diff <= 2:
+            selectedPats = Logic.EASYPATS
+        else:
+            selectedPats = Logic.HARDPATS
+
+    procPatterns = []
+    for pattern in selectedPats:
+        procPatterns.append(pattern)
+        if pattern != pattern[::-1]:
+            procPatterns.append(pattern[::-1])
+    return procPatterns
+
+
+#> Returns the index in the pattern of the spot Logic.elementChoice() picks:
+#  the first blank with a piece next to it.
+def patternOffset(pattern):
+    for indx in range(len(pattern)):
+        if pattern[indx] != "X":
+            continue
+        for adjIndx in [indx-1, indx+1]:
+            if 0 <= adjIndx < len(pattern) and pattern[adjIndx] != "X":
+                return indx
+    return pattern.index("X")
+
+
+#> Stacks a list of Board objects (all of the same dimension) into an
+#  (N, dimension, dimension) int8 array.
+def stackBoards(boards):
+    dimension = boards[0].dimension
+    stacked = np.empty((len(boards), dimension, dimension), dtype=np.int8)
+    for indx in range(len(boards)):
+        cells = np.frombuffer(bytes(boards[indx].cells), dtype=np.int8)
+        stacked[indx] = cells.reshape(dimension, dimension)
+    return stacked
+
+
+#> Converts Board codes to relative codes (0 blank, 1 computer, 2 player)
+#  and pads every side with OFFBOARD cells.
+def relativeBoards(boards, comps, pad):
+    comps = comps.reshape(-1, 1, 1)
+    relative = np.where(boards == 0, 0, np.where(boards == comps, 1, 2)).astype(np.int8)
+    return np.pad(relative, ((0, 0), (pad, pad), (pad, pad)), constant_values=OFFBOARD)
+
+
+#> Returns a (dimension, dimension) bool array which is True where the
+#  diagonal through each start spot is shorter than 5, since lookUpPatterns()
+#  never scans those lines.
+def shortDiagonals(dimension, difRow):
+    cols = np.arange(dimension).reshape(-1, 1)
+    rows = np.arange(dimension).reshape(1, -1)
+    last = dimension - 1
+    if difRow == 1:
+        length = np.minimum(cols, rows) + np.minimum(last-cols, last-rows) + 1
+    else:
+        length = np.minimum(cols, last-rows) + np.minimum(last-cols, rows) + 1
+    return length < 5
+
+
+#> Returns the AI's moves for a batch of positions as an (N, 2) int array of
+#  col/row pairs ([-1, -1] for a full board).
+#> boards: (N, dimension, dimension) array of Board codes.
+#> comps: (N,) array with the Board code the AI plays in each position.
+#> diff: the difficulty used for the whole batch (1 = easy, 2 = medium, 3 = hard).
+#> patterns: optional generalized pattern list, best first, used instead of the
+#  one diff selects.
+def batchDecisions(boards, comps, diff=3, rng=None, patterns=None):
+    if rng is None:
+        rng = np.random.default_rng()
+    boards = np.asarray(boards, dtype=np.int8)
+    comps = np.asarray(comps, dtype=np.int8)
+    count, dimension = boards.shape[0], boards.shape[1]
+    cellCount = dimension * dimension
+    pad = 5
+    relative = relativeBoards(boards, comps, pad)
+
+    cols = np.arange(dimension).reshape(-1, 1)
+    rows = np.arange(dimension).reshape(1, -1)
+    noMove = cellCount # Larger than any flat index.
+    result = np.full(count, noMove, dtype=np.int64)
+    bestRandom = np.full(count, -1.0)
+
+    for pattern in orderedPatterns(diff, patterns):
+        codes = [RELCODES[letter] for letter in pattern]
+        offset = patternOffset(pattern)
+        patternBest = np.full(count, noMove, dtype=np.int64)
+
+        for difCol, difRow in DIRECTIONS:
+            # True where the pattern starts at [col, row] in this direction.
+            match = np.ones((count, dimension, dimension), dtype=bool)
+            for indx in range(len(codes)):
+                colStart = pad + indx*difCol
+                rowStart = pad + indx*difRow
+                window = relative[:, colStart:colStart+dimension, rowStart:rowStart+dimension]
+                match &= window == codes[indx]
+            if difCol != 0 and difRow != 0:
+                match &= ~shortDiagonals(dimension, difRow)
+
+            moveIndx = (cols + offset*difCol) * dimension + (rows + offset*difRow)
+            if diff == 1:
+                # Each match gets a random key; the largest key is played.
+                keys = np.where(match, rng.random(match.shape), -1.0)
+                flatKeys = keys.reshape(count, -1)
+                winner = flatKeys.argmax(axis=1)
+                winnerKey = flatKeys[np.arange(count), winner]
+                better = winnerKey > bestRandom
+                bestRandom = np.where(better, winnerKey, bestRandom)
+                result = np.where(better, moveIndx.reshape(-1)[winner], result)
+            else:
+                keys = np.where(match, moveIndx, noMove)
+                patternBest = np.minimum(patternBest, keys.reshape(count, -1).min(axis=1))
+
+        if diff != 1:
+            # Only boards with no better (lower index) pattern take this one.
+            result = np.where(result == noMove, patternBest, result)
+
+    unmatched = result == noMove
+    if unmatched.any():
+        result[unmatched] = fallbackMoves(boards[unmatched], rng)
+
+    moves = np.full((count, 2), -1, dtype=np.int64)
+    found = result != noMove
+    moves[found, 0] = result[found] // dimension
+    moves[found, 1] = result[found] % dimension
+    return moves
+
+
+#> Picks a move for each position without a pattern match: the centre of an
+#  empty board, else a random empty spot next to a piece, else any empty spot.
+#> Returns flat col*dimension+row indices (dimension**2 for a full board).
+def fallbackMoves(boards, rng):
+    count, dimension = boards.shape[0], boards.shape[1]
+    filled = boards != 0
+    empty = ~filled
+
+    # Marks every spot within one step of a piece.
+    padded = np.pad(filled, ((0, 0), (1, 1), (1, 1)))
+    near = np.zeros_like(filled)
+    for difCol in [-1, 0, 1]:
+        for difRow in [-1, 0, 1]:
+            near |= padded[:, 1+difCol:1+difCol+dimension, 1+difRow:1+difRow+dimension]
+
+    keys = rng.random(boards.shape) + np.where(near & empty, 1.0, 0.0)
+    keys = np.where(empty, keys, -1.0).reshape(count, -1)
+    moves = keys.argmax(axis=1)
+    moves = np.where(keys.max(axis=1) < 0, dimension*dimension, moves)
+
+    centre = (dimension//2) * dimension + dimension//2
+    moves = np.where(filled.reshape(count, -1).any(axis=1), moves, centre)
+    return moves
+
+
+#> Convenience wrapper for a list of Logic games which share one dimension.
+#> Returns a list of [col, row] moves, one for each game.
+def decideGames(games, diff=3, rng=None):
+    boards = []
+    comps = []
+    for game in games:
+        boards.append(Board.fromState(game.state))
+        comps.append(Board.CODES[game.comp])
+    moves = batchDecisions(stackBoards(boards), np.array(comps), diff, rng)
+    return moves.tolist()
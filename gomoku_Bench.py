@@ -0,0 +1,149 @@
+###
+### Headless benchmarks for the Gomoku engine.
+###
+###     perft: walks every sequence of legal moves to a fixed depth using
+###            Logic.play() / Logic.undo(), counts the nodes visited and checks
+###            that the position, hash and candidate set are restored exactly.
+###
+###     startup: times a fresh interpreter importing each headless module and
+###            running "gomoku_Control.py <command> --help", and checks that
+###            none of them imports turtle or tkinter.
+###
+###     Usage: python gomoku_Bench.py [--dimension N] [--depth D]
+###            python gomoku_Bench.py --startup [--repeats R]
+###
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from gomoku_Logic import Logic
+
+
+#> Counts the leaf nodes reachable from the current position in depth moves.
+#> A move which wins the game ends that line, so it is counted as a leaf.
+def perft(game, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for col in range(game.dimension):
+        for row in range(game.dimension):
+            if game.state[col][row] != game.BLANK:
+                continue
+            piece = game.player
+            game.play(col, row)
+            if depth == 1 or game.checkWin(col, row, piece) != None:
+                nodes += 1
+            else:
+                nodes += perft(game, depth-1)
+            game.undo()
+    return nodes
+
+
+#> Returns the number of leaves perft() should find on an empty board, where
+#  no line can be won within the depths this benchmark uses.
+def expectedEmptyPerft(dimension, depth):
+    nodes = 1
+    for ply in range(depth):
+        nodes = nodes * (dimension*dimension - ply)
+    return nodes
+
+
+#> Takes a snapshot of everything play() / undo() are meant to restore.
+def snapshot(game):
+    return ([column[:] for column in game.state], game.player, game.posHash,
+            set(game.candidates), len(game.history))
+
+
+#> Runs perft on an empty board of the given size, checks the node count and
+#  that the game was restored exactly, and reports the throughput.
+#> Returns [nodes, seconds, nodes per second].
+def runPerft(dimension, depth):
+    game = Logic(dimension)
+    before = snapshot(game)
+
+    start = time.perf_counter()
+    nodes = perft(game, depth)
+    elapsed = time.perf_counter() - start
+
+    expected = expectedEmptyPerft(dimension, depth)
+    if nodes != expected:
+        raise AssertionError("perft(" + str(depth) + ") found " + str(nodes) +
+                             " nodes, expected " + str(expected))
+    if snapshot(game) != before:
+        raise AssertionError("play() / undo() did not restore the position")
+    return [nodes, elapsed, nodes / max(elapsed, 1e-9)]
+
+
+HEADLESS = ["gomoku_Control", "gomoku_Logic", "gomoku_Bench", "gomoku_Analyse",
+            "gomoku_Server", "gomoku_Sparse", "gomoku_SelfPlay", "gomoku_Tune"]
+
+# Run in a fresh interpreter: prints the import time and whether a GUI toolkit came with it.
+IMPORTSCRIPT = "import sys, time\n" + \
+               "start = time.perf_counter()\n" + \
+               "import {module}\n" + \
+               "print(time.perf_counter() - start, 'turtle' in sys.modules or 'tkinter' in sys.modules)"
+
+
+#> Returns the best of repeats runs of a fresh interpreter running args, as
+#  [seconds, stdout of the last run].
+def timeProcess(args, repeats):
+    best = None
+    for attempt in range(repeats):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable] + args, capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return [best, result.stdout]
+
+
+#> Measures import and command start-up times (best of repeats, in seconds).
+#> Returns a list of [name, import seconds or None, process seconds, GUI imported].
+def runStartup(repeats=5):
+    rows = []
+    baseline = timeProcess(["-c", "pass"], repeats)[0]
+    rows.append(["python", None, baseline, False])
+    for module in HEADLESS:
+        elapsed, output = timeProcess(["-c", IMPORTSCRIPT.format(module=module)], repeats)
+        importTime, gui = output.split()
+        rows.append([module, float(importTime), elapsed, gui == "True"])
+    for command in ["bench", "analyse", "serve", "selfplay", "tune"]:
+        elapsed = timeProcess(["gomoku_Control.py", command, "--help"], repeats)[0]
+        rows.append(["gomoku_Control " + command, None, elapsed, False])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gomoku make/unmake benchmark")
+    parser.add_argument("--dimension", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--startup", action="store_true",
+                        help="time imports and command start-up instead")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        failed = False
+        for name, importTime, elapsed, gui in runStartup(args.repeats):
+            line = name.ljust(26) + " process " + str(round(elapsed*1000, 1)).rjust(7) + " ms"
+            if importTime is not None:
+                line = line + "   import " + str(round(importTime*1000, 1)).rjust(7) + " ms"
+            if gui:
+                line = line + "   imports turtle / tkinter!"
+                failed = True
+            print(line)
+        if failed:
+            raise SystemExit(1)
+        return
+
+    nodes, elapsed, rate = runPerft(args.dimension, args.depth)
+    print("perft(" + str(args.depth) + ") on " + str(args.dimension) + "x" +
+          str(args.dimension) + ": " + str(nodes) + " nodes in " +
+          str(round(elapsed, 3)) + " s (" + str(int(rate)) + " nodes/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+from array import array
+
+#> A compact, UI-free copy of a Gomoku position.
+#> The cells are stored column-major in one flat bytearray of size dimension**2,
+#  so a position costs about one byte per cell and copying it is a single
+#  buffer copy. Used for headless games, search and bulk storage; the GUI game
+#  itself still runs on Logic.state.
+#> Cell codes: EMPTY (0), BLACK (1) and WHITE (2).
+class Board:
+    __slots__ = ("dimension", "cells", "toMove")
+
+    EMPTY = 0
+    BLACK = 1
+    WHITE = 2
+    # Conversions between cell codes and the piece strings used by Logic.
+    PIECES = "XBW"
+    CODES = {"X": 0, "B": 1, "W": 2}
+
+    #> Creates an empty board. Black always plays first.
+    def __init__(self, dimension, cells=None, toMove=BLACK):
+        self.dimension = dimension
+        if cells is None:
+            cells = bytearray(dimension * dimension)
+        self.cells = cells
+        self.toMove = toMove
+
+
+    #> Converts a col/row pair to the flat index of that cell.
+    def index(self, col, row):
+        return col * self.dimension + row
+
+
+    #> Returns the col of a flat cell index.
+    def colOf(self, indx):
+        return indx // self.dimension
+
+
+    #> Returns the row of a flat cell index.
+    def rowOf(self, indx):
+        return indx % self.dimension
+
+
+    #> Returns True if the col/row pair is on the board.
+    def inBounds(self, col, row):
+        return 0 <= col < self.dimension and 0 <= row < self.dimension
+
+
+    #> Returns the cell code at col/row.
+    def get(self, col, row):
+        return self.cells[col * self.dimension + row]
+
+
+    #> Sets the cell code at col/row.
+    def set(self, col, row, code):
+        self.cells[col * self.dimension + row] = code
+
+
+    #> Returns the cell code of the other player.
+    def opponent(self, code):
+        return 3 - code
+
+
+    #> Returns an independent copy of the position (a single buffer copy).
+    def copy(self):
+        return Board(self.dimension, self.cells[:], self.toMove)
+
+
+    #> Returns the number of empty cells.
+    def emptyCount(self):
+        return self.cells.count(self.EMPTY)
+
+
+    #> Returns the cells as a signed byte array, for bulk export.
+    def toArray(self):
+        return array("b", self.cells)
+
+
+    #> Builds a Board from a Logic-style 2D state list ("X", "B", "W").
+    @classmethod
+    def fromState(cls, state, toMove="B"):
+        dimension = len(state)
+        cells = bytearray(dimension * dimension)
+        indx = 0
+        for col in range(dimension):
+            for row in range(dimension):
+                cells[indx] = cls.CODES[state[col][row]]
+                indx += 1
+        return cls(dimension, cells, cls.CODES[toMove])
+
+
+    #> Builds the Logic-style 2D state list for this position.
+    def toState(self):
+        state = []
+        for col in range(self.dimension):
+            start = col * self.dimension
+            column = []
+            for code in self.cells[start:start + self.dimension]:
+                column.append(self.PIECES[code])
+            state.append(column)
+        return state
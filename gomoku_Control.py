@@ -35,15 +35,73 @@
 ###     Creates / uses files:
 ###         > gomoku_Save.gmk
 ###
+###     Command line (with no command, the game is started as before):
+###         python gomoku_Control.py play [--sparse [--limit N]]
+###         python gomoku_Control.py bench [--startup] ...
+###         python gomoku_Control.py selfplay ...   (needs NumPy)
+###         python gomoku_Control.py analyse PATH ...
+###         python gomoku_Control.py serve [load] ...  (hosts games by default)
+###         python gomoku_Control.py tune ...       (needs NumPy)
+###     Each command only imports the modules it needs; turtle / tkinter are
+###     only imported by play. The options of each command are listed by
+###     "python gomoku_Control.py <command> --help".
+###     play and serve use the ranking written by tune (gomoku_Ranking.json)
+###     when that file exists; --ranking names another file.
+###
 
+import argparse
+import importlib
 import os
-from gomoku_GUI import Visuals
-from gomoku_Logic import Logic
+import sys
+
+#> Headless commands and the module whose main(argv) runs each of them.
+COMMANDS = {"bench": "gomoku_Bench", "selfplay": "gomoku_SelfPlay",
+            "analyse": "gomoku_Analyse", "serve": "gomoku_Server", "tune": "gomoku_Tune"}
+
+
+#> Loads the pattern ranking at path into Logic if the file exists. A ranking
+#  which does not fit the current patterns is reported through parser.error().
+def useRanking(parser, path):
+    from gomoku_Logic import Logic
+    if os.path.exists(path):
+        try:
+            Logic.loadPatternRanking(path)
+        except ValueError as error:
+            parser.error(path + ": " + str(error))
 
 
 #> Initiates game setup and enters mainloop(), which does not end until game close.
-def main():
-    os.system('cls' if os.name == 'nt' else 'clear') #Clears the terminal window
+def play(argv=None):
+    parser = argparse.ArgumentParser(description="Play Gomoku against the computer")
+    parser.add_argument("--ponder-cpu", type=float, default=None,
+                        help="share of a core the AI may use on your time (0 = off)")
+    parser.add_argument("--autosave-interval", type=float, default=None,
+                        help="seconds between periodic checkpoints")
+    parser.add_argument("--no-fsync", action="store_true",
+                        help="do not flush saves to disk (faster, less safe)")
+    parser.add_argument("--sparse", action="store_true",
+                        help="play on a large or unbounded sparse board")
+    parser.add_argument("--limit", type=int, default=None,
+                        help="side of the sparse board (default: unbounded)")
+    parser.add_argument("--diff", type=int, default=3, help="difficulty on the sparse board")
+    parser.add_argument("--ranking", default="gomoku_Ranking.json",
+                        help="tuned pattern ranking, used if the file exists")
+    args = parser.parse_args(argv)
+    useRanking(parser, args.ranking) # Before SparseGame copies HARDPATS.
+    from gomoku_GUI import Visuals # Imports turtle / tkinter, so only done here.
+    from gomoku_Logic import Logic
+    if args.sparse:
+        from gomoku_Sparse import SparseGame
+        graphics = Visuals()
+        graphics.setupSparse(SparseGame(args.limit, args.diff))
+        graphics.win.mainloop()
+        return
+    if args.ponder_cpu is not None:
+        Logic.PONDERCPU = args.ponder_cpu
+    if args.autosave_interval is not None:
+        Logic.AUTOSAVEINTERVAL = args.autosave_interval
+    if args.no_fsync:
+        Logic.AUTOSAVEFSYNC = False
 
     #> Initializes the Visuals and Logic instances which will be used throughout.
     graphics = Visuals()
@@ -63,8 +121,30 @@ def main():
             game.computerMove()  # then play that before looping.
     graphics.toggleWelcome()
     graphics.displayTurn()
+    game.recovered = game.findAutosave() # Offers to carry on an unfinished game.
+    if game.recovered is not None:
+        graphics.displayMessage(" Autosave  found\n R  resumes,  a\n move  drops  it")
 
     graphics.win.mainloop() #> Loops indefinitely, waiting for click or key input
 
 
-main()
\ No newline at end of file
+#> Runs the command named by the first argument with the rest of them.
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) == 0:
+        argv = ["play"]
+
+    parser = argparse.ArgumentParser(description="Gomoku")
+    parser.add_argument("command", choices=["play"] + list(COMMANDS))
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="options for the command")
+    args = parser.parse_args(argv[:1])
+
+    if args.command == "play":
+        play(argv[1:])
+    else:
+        importlib.import_module(COMMANDS[args.command]).main(argv[1:])
+
+
+if __name__ == "__main__":
+    main()
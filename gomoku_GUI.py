@@ -1,4 +1,5 @@
 import turtle
+from gomoku_Rules import RULESETS, RULEORDER
 
 class Visuals:
     BOARDSIZE = 630 #Board size, in pixels.
@@ -50,8 +51,20 @@ class Visuals:
         self.win.onkey(self.toggleWelcome,"w")
         self.win.onkey(self.toggleDiffSettings,"d")
         self.win.onkey(self.disableComp,"0")
+        self.win.onkey(self.toggleMCTS,"m")
+        self.win.onkey(self.game.undoTurn,"u")
+        self.win.onkey(self.cycleRules,"v")
+        self.win.onkey(self.game.resumeAutosave,"r")
         self.win.onkey(self.toggleHelp,"h")
         self.win.listen()
+        self.win.ontimer(self.periodicSave, int(self.game.AUTOSAVEINTERVAL*1000))
+
+
+    #> Checkpoints the game every AUTOSAVEINTERVAL seconds, so settings changed
+    #  between moves are kept too. The writer skips unchanged saves.
+    def periodicSave(self):
+        self.game.autosave()
+        self.win.ontimer(self.periodicSave, int(self.game.AUTOSAVEINTERVAL*1000))
 
 
     #> Draws the Gomoku board grid and labels each line.
@@ -74,11 +87,10 @@ class Visuals:
             self.lineman.write(row,move=False,align="right",font=("Arial",10,"normal"))
             gotoy = gotoy + self.game.cellSize #Offsets the y-coord by a grid unit.
 
-        # Constructs a list containing 'n' capital letters, where n = dimension.
-        upperCase = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        # Constructs a list containing 'n' column labels, where n = dimension.
         letters = []
         for let in range(self.game.dimension):
-            letters.append(upperCase[let])
+            letters.append(self.colLabel(let))
 
         # Draws vertical lines.
         gotox = 0 + self.OFFSETX
@@ -98,6 +110,132 @@ class Visuals:
         self.win.tracer(1)
 
 
+    #> Returns the label of a column: A to Z, then AA, AB, ... for wide boards.
+    #> Columns left of 0 (on an unbounded board) are labelled with a minus sign.
+    def colLabel(self, col):
+        if col < 0:
+            return "-" + self.colLabel(-col-1)
+        upperCase = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+        label = ""
+        col = col + 1
+        while col > 0:
+            col, letter = divmod(col-1, 26)
+            label = upperCase[letter] + label
+        return label
+
+
+    #> Draws the part of a sparse board (see gomoku_Sparse.py) which lies in the
+    #  size x size view starting at originCol/originRow, with its pieces.
+    #> Labels follow the view, so large or unbounded boards scroll and zoom to
+    #  the region returned by SparseBoard.viewWindow().
+    def drawSparseView(self, board, originCol, originRow, size):
+        self.win.tracer(0)
+        self.lineman.clear()
+        self.clearPieces()
+        cellSize = self.BOARDSIZE / size
+        font = ("Arial", max(6, min(10, int(cellSize/2))), "normal")
+
+        self.lineman.setheading(0)
+        for row in range(size):
+            self.lineman.penup()
+            self.lineman.goto(-cellSize/2 + self.OFFSETX, row*cellSize + self.OFFSETY)
+            self.lineman.pendown()
+            self.lineman.write(originRow+row+1, move=False, align="left", font=font)
+            self.lineman.forward(self.BOARDSIZE)
+
+        self.lineman.setheading(90)
+        for col in range(size):
+            self.lineman.penup()
+            self.lineman.goto(col*cellSize + self.OFFSETX, -cellSize/2 + self.OFFSETY - 25)
+            self.lineman.write(self.colLabel(originCol+col), move=False,
+                               align="center", font=font)
+            self.lineman.forward(25)
+            self.lineman.pendown()
+            self.lineman.forward(self.BOARDSIZE)
+
+        # Only the pieces inside the view are visited, not the whole board.
+        self.stamper.shapesize(2*(10/size), 2*(10/size))
+        for (col, row), piece in board.cells.items():
+            if originCol <= col < originCol+size and originRow <= row < originRow+size:
+                if piece == "B":
+                    self.stamper.color("black")
+                else:
+                    self.stamper.color("white")
+                self.stamper.goto((col-originCol)*cellSize + self.OFFSETX,
+                                  (row-originRow)*cellSize + self.OFFSETY)
+                self.stamps[(col, row)] = self.stamper.stamp()
+        self.win.tracer(1)
+
+
+    #> Plays a SparseGame (see gomoku_Sparse.py) in this window instead of a
+    #  Logic game. The view follows the pieces with SparseBoard.viewWindow()
+    #  and is redrawn with drawSparseView() after every turn.
+    def setupSparse(self, sparseGame):
+        self.sparseGame = sparseGame
+        self.sparseView = None
+        self.win.onclick(self.sparseClick)
+        self.win.onkey(exit,"e")
+        self.win.onkey(exit,"x")
+        self.win.listen()
+        if sparseGame.player == sparseGame.comp:
+            self.sparseComputerMove()
+        self.redrawSparse()
+
+
+    #> Redraws the sparse board around its pieces.
+    def redrawSparse(self):
+        self.sparseView = self.sparseGame.board.viewWindow()
+        originCol, originRow, size = self.sparseView
+        self.drawSparseView(self.sparseGame.board, originCol, originRow, size)
+
+
+    #> Plays the computer's move in the sparse game.
+    #> Returns "win" if it won, "draw" if there is nowhere left to play, else None.
+    def sparseComputerMove(self):
+        game = self.sparseGame
+        move = game.decisionMaker(game.GUITIMELIMIT)
+        if move == []:
+            game.winState = True
+            return "draw"
+        if game.play(move[0], move[1]) != None:
+            return "win"
+        if game.winState: # play() also ends the game on a full board.
+            return "draw"
+        return None
+
+
+    #> Click handler for the sparse game: places the human's piece at the
+    #  clicked spot of the current view, then the computer replies.
+    def sparseClick(self, x, y):
+        game = self.sparseGame
+        if game.winState:
+            return
+        originCol, originRow, size = self.sparseView
+        cellSize = self.BOARDSIZE / size
+        viewCol = int(round((x - self.OFFSETX) / cellSize))
+        viewRow = int(round((y - self.OFFSETY) / cellSize))
+        col = originCol + viewCol
+        row = originRow + viewRow
+        if not (0 <= viewCol < size and 0 <= viewRow < size) or not game.isValidInput(col, row):
+            return
+
+        result = None
+        if game.play(col, row) != None:
+            result = "   You  win!\n"
+        elif game.winState:
+            result = "   It's  a  draw!\n"
+        else:
+            outcome = self.sparseComputerMove()
+            if outcome == "win":
+                result = "   You  lose!\n"
+            elif outcome == "draw":
+                result = "   It's  a  draw!\n"
+        self.redrawSparse()
+        if result is not None:
+            self.messenger.clear()
+            self.messenger.write(result, move=False, align="left", font=("Impact", 22, "normal"))
+
+
     #> Creates instance-wide turtles to enable so that their stamps
     #  can be cleared later, which is not possible if they are local.
     def turtleBreeder(self):
@@ -116,6 +254,16 @@ class Visuals:
         self.stamper.speed(0)
         self.stamper.penup()
         self.stamper.goto(50+self.OFFSETX,50+self.OFFSETY)
+        self.stamps = {} # (col, row) -> stamp id of the piece drawn there.
+
+        # Initializes the turtle which marks the last move.
+        self.highlighter = turtle.Turtle()
+        self.highlighter.hideturtle()
+        self.highlighter.shape("circle")
+        self.highlighter.color("red")
+        self.highlighter.speed(0)
+        self.highlighter.penup()
+        self.highlightStamp = None
 
         # Initializes the turtle which draws the grid.
         self.lineman = turtle.Turtle()
@@ -221,7 +369,7 @@ class Visuals:
             self.diffDisplayer.shape("easyDiffDisplay.gif")
         elif self.game.diff == 2:
             self.diffDisplayer.shape("medDiffDisplay.gif")
-        elif self.game.diff == 3:
+        elif self.game.diff == 3 or self.game.diff == self.game.MCTSDIFF:
             self.diffDisplayer.shape("hardDiffDisplay.gif")
 
             
@@ -270,6 +418,27 @@ class Visuals:
         self.displayDiff()
         
         
+    #> Switches to the next rule variant (standard, freestyle, renju) and
+    #  shows its name. Invoked through the keyboard binding assigned to "v".
+    def cycleRules(self):
+        nextIndx = (RULEORDER.index(self.game.rules.name) + 1) % len(RULEORDER)
+        self.game.rules = RULESETS[RULEORDER[nextIndx]]
+        self.displayMessage("     Rules:\n   " + self.game.rules.name + "\n")
+
+
+    #> Switches between the hard pattern AI and the Monte Carlo tree search AI.
+    #> Invoked through the keyboard binding assigned to the "m" key.
+    def toggleMCTS(self):
+        if self.game.diff != self.game.MCTSDIFF:
+            self.game.diff = self.game.MCTSDIFF
+            self.displayMessage("   Tree  search\n   AI  enabled\n")
+        else:
+            self.game.diff = 3
+            self.displayMessage("   Pattern  AI\n     enabled\n")
+        self.game.playPatterns = self.game.patternConverter()
+        self.displayDiff()
+
+
     #> Accepts a string and writes it to the display area left of the game board.
     #> Used to display arbitrary information to the user.
     def displayMessage(self, message):
@@ -287,23 +456,76 @@ class Visuals:
                                  align="left", font=("Impact", 22, "normal"))
 
 
-    #> Stamps the current player's game piece at the X and Y coordinates specified
-    def stampPiece(self, posX,posY):
-        if self.game.player == "B":
-            self.stamper.color("black")
-        else:
-            self.stamper.color("white")
+    #> Stamps the current player's game piece at the col and row specified.
+    #> The stamp id is kept so the piece can later be changed on its own.
+    def stampPiece(self, col, row, colour=None):
+        if colour is None:
+            if self.game.player == "B":
+                colour = "black"
+            else:
+                colour = "white"
+        self.stamper.color(colour)
         self.stamper.shapesize(2*(10/self.game.dimension),2*(10/self.game.dimension))
-        self.stamper.goto(posX+self.OFFSETX,posY+self.OFFSETY)
-        self.stamper.stamp()
+        self.stamper.goto(col*self.game.cellSize+self.OFFSETX, row*self.game.cellSize+self.OFFSETY)
+        oldStamp = self.stamps.get((col, row))
+        if oldStamp is not None: # Never leaves a stale stamp underneath.
+            self.stamper.clearstamp(oldStamp)
+        self.stamps[(col, row)] = self.stamper.stamp()
+
+
+    #> Removes the piece drawn at col/row, if there is one, with a single clearstamp.
+    def clearPiece(self, col, row):
+        stampId = self.stamps.pop((col, row), None)
+        if stampId is not None:
+            self.stamper.clearstamp(stampId)
+        if self.highlightStamp is not None and self.highlightStamp[0] == (col, row):
+            self.highlighter.clearstamp(self.highlightStamp[1])
+            self.highlightStamp = None
+
+
+    #> Redraws the piece at col/row in another colour (e.g. for hints or replays).
+    def recolourPiece(self, col, row, colour):
+        if (col, row) in self.stamps:
+            self.stampPiece(col, row, colour)
+            if self.highlightStamp is not None and self.highlightStamp[0] == (col, row):
+                self.highlightPiece(col, row) # Keeps the mark on top.
+
+
+    #> Marks col/row as the last move with a small dot, removing the previous
+    #  mark. Passing None for col clears the mark.
+    def highlightPiece(self, col, row):
+        if self.highlightStamp is not None:
+            self.highlighter.clearstamp(self.highlightStamp[1])
+            self.highlightStamp = None
+        if col is None:
+            return
+        size = 0.6*(10/self.game.dimension)
+        self.highlighter.shapesize(size, size)
+        self.highlighter.goto(col*self.game.cellSize+self.OFFSETX, row*self.game.cellSize+self.OFFSETY)
+        self.highlightStamp = ((col, row), self.highlighter.stamp())
+
+
+    #> Removes every piece and the last-move mark, e.g. for a new game.
+    def clearPieces(self):
+        self.stamper.clear()
+        self.highlighter.clear()
+        self.stamps = {}
+        self.highlightStamp = None
+
+
+    #> Ends the game as a draw (the board is full) and prints a message.
+    def setDraw(self):
+        self.game.winState = True
+        self.displayMessage("   It's  a  draw!\n")
 
 
     #> Draws a line which passes through the 5 winning pieces, and prints a message.
     #> Both parameters are expected to be numerical 2-tuples of form (col, row).
+    #> The winner is read from the piece at the start of the winning line.
     def setWin(self, start, end):
         self.game.winState = True
 
-        if self.game.player == self.game.human:
+        if self.game.state[start[0]][start[1]] == self.game.human:
             self.resultMan.shape("winMessage.gif")
             self.resultMan.stamp()
         else:
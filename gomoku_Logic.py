@@ -1,4 +1,71 @@
+import copy
+import json
 import random
+import threading
+import time
+from collections import OrderedDict
+from gomoku_Autosave import AutoSaver, findCheckpoint, readSave, writeAtomic
+from gomoku_Board import Board
+from gomoku_MCTS import MCTS
+from gomoku_Patterns import compilePatterns
+from gomoku_Ponder import Ponderer
+from gomoku_Rules import RULESETS
+
+
+#> A least-recently-used memo of pattern matches for single board lines.
+#> The result of matching a line only depends on the line string and the
+#  pattern set, so identical lines (most of them mostly blank) are matched once
+#  and then reused across turns and games.
+#> Keys are (line string, pattern tuple); values are (matches, windows): the
+#  list of [pattern index, element index] pairs built by Logic.matchLine()
+#  and the number of windows scanned to find them.
+#> Locked, since server workers and the pondering thread share it.
+class LineCache:
+    def __init__(self, maxSize=50000):
+        self.maxSize = maxSize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+
+    #> Returns the cached value for key, or None if it is not cached.
+    #> A hit moves the entry to the "recently used" end of the queue.
+    def get(self, key):
+        with self.lock:
+            result = self.entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+
+    #> Stores the value for key, dropping the least recently used entry
+    #  once the cache is full.
+    def put(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            if len(self.entries) > self.maxSize:
+                self.entries.popitem(last=False)
+
+
+    #> Empties the cache and resets the hit/miss counters.
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+    #> Returns the fraction of lookups that were hits (0.0 if none were made).
+    def hitRate(self):
+        total = self.hits + self.misses
+        if total == 0:
+            return 0.0
+        return self.hits / total
+
 
 #> This class is instantiated in gomoku_Control.py to run the critical operations
 #  related to the progression and intialization of the game. 
@@ -11,12 +78,29 @@ class Logic:
     EASYPATS = ["XCCCC","CXCCC","CCXCC","XPPPP","PXPPP","PPXPP","XCCCX","XPPPX","XCCC"]
     HARDPATS = ["XCCCC","CCXCC","CXCCC","XPPPP","PXPPP","PPXPP","XPXPP","XCXCC",\
                 "XCCCX","XPPPX","XCCC","CXCXC","XPPP","PXPXP"]
+    GUITIMELIMIT = 0.05 # Seconds the AI may think per move in the GUI.
+    SELFPLAYTIMELIMIT = 0.005 # Per-move budget for bulk headless games.
+    MCTSDIFF = 4 # Difficulty level which uses the Monte Carlo tree search AI.
+    MCTSTIMELIMIT = 1.0 # GUI budget for the tree search, which needs more time.
+    PONDERCPU = 0.5 # Share of a core used to think on the human's time (0 = off).
+    AUTOSAVEPATH = "gomoku_Autosave.gmk" # Checkpoint written after every turn.
+    AUTOSAVEINTERVAL = 30 # Seconds between the GUI's periodic checkpoints.
+    AUTOSAVEFSYNC = True # Flush saves to disk before counting them as written.
+    lineCache = LineCache() # Shared by every game in the process.
+    ZOBRIST = {} # (col, row, piece) -> random 64-bit key, for every spot of the largest board yet.
+    zobristSize = 0 # Dimension of the largest board ZOBRIST has keys for.
+    zobristLock = threading.Lock() # Games on other threads may grow ZOBRIST at the same time.
+    SIDEKEY = 0x9E3779B97F4A7C15 # Toggled into the hash on every move.
+    zobristRandom = random.Random(231) # Separate so game randomness is untouched.
                 
     #> Initializes instance variables required for the progression of the game.
     #> Randomly selects dimension, scales cellSize to match, assigns player colours.
     #> Converts generalized patterns to game-specific patterns
-    def __init__(self):
-        self.dimension = random.randrange(10,20)
+    #> dimension may be given for headless games; otherwise it is random.
+    def __init__(self, dimension=None):
+        if dimension is None:
+            dimension = random.randrange(10,20)
+        self.dimension = dimension
         self.state = self.stateConstructor()
         self.player = None
         self.human = None
@@ -30,15 +114,45 @@ class Logic:
         self.diff = 1 # Default difficulty is "easy".
         self.move = 0
         self.winState = False
+        self.rules = RULESETS["standard"] # Exactly 5 in a row wins.
+
+        self.deadline = None # perf_counter() value at which the AI must answer.
+        self.evalCount = 0 # Number of line/pattern checks in the last decision.
+        self.timedOut = False # True if the last decision hit its deadline.
+        self.cancelEvent = None # threading.Event which ends a search early once set.
+        self.mctsEngine = None # Created on the first MCTS move; keeps its tree.
+        # Created by the GUI game on first use, so headless games stay small.
+        self.ponderer = None # Ponderer: searches while the human thinks.
+        self.autosaver = None # AutoSaver: writes checkpoints off the GUI thread.
+        self.recovered = None # Checkpoint text offered for resuming; not overwritten while set.
 
         self.playerSelector() # Selects the player assignments & who plays first.
         self.playPatterns = self.patternConverter()
+        self.rebuildIndexes()
+
+
+    #> Replaces the ranking of HARDPATS with a tuned one written by gomoku_Tune.py.
+    #> The file must rank exactly the same patterns; raises ValueError if not.
+    #> Affects every game created or converted afterwards.
+    @classmethod
+    def loadPatternRanking(cls, path="gomoku_Ranking.json"):
+        rankingFile = open(path, "r")
+        ranking = json.load(rankingFile)
+        rankingFile.close()
+
+        patterns = ranking["HARDPATS"]
+        if sorted(patterns) != sorted(cls.HARDPATS):
+            raise ValueError("ranking does not match the HARDPATS patterns")
+        cls.HARDPATS = patterns
 
 
     #> Called at the beginning of a (new or loaded) game to prepare for play.
     def initializeNewGame(self, load=False):
+        if self.ponderer is not None:
+            self.ponderer.stop() # Its answers are for the old game.
+        self.recovered = None # Starting another game declines the resume offer.
         self.graphics.lineman.clear()
-        self.graphics.stamper.clear()
+        self.graphics.clearPieces()
         self.graphics.winMan.clear()
         self.graphics.messenger.clear()
         self.graphics.resultMan.clear()
@@ -59,6 +173,7 @@ class Logic:
         self.playPatterns = self.patternConverter()
         
         self.state = self.stateConstructor()
+        self.rebuildIndexes()
         self.graphics.drawBoard()
         self.graphics.displayTurn()
         self.graphics.displayDiff()
@@ -66,6 +181,8 @@ class Logic:
         #> If the first player is the computer, then initiate that move
         if self.player == self.comp:
             self.computerMove()
+        if not load: # Replaces the old game's checkpoint.
+            self.autosave()
 
 
     #> Creates a 2-D list populated with the str "X" of size dimension.
@@ -78,6 +195,141 @@ class Logic:
         return newState
 
 
+    #> Returns a compact Board copy of the current position and side to move.
+    def toBoard(self):
+        return Board.fromState(self.state, self.player)
+
+
+    #> Replaces the current position with the one stored in a Board.
+    #> The player assignments (human / comp) are left unchanged.
+    def loadBoard(self, board):
+        self.dimension = board.dimension
+        self.state = board.toState()
+        self.player = Board.PIECES[board.toMove]
+        self.rebuildIndexes()
+
+
+    #> Returns the random hash key for a piece at col/row.
+    #> prepareZobrist() must already have covered the board (rebuildIndexes() does).
+    def zobristKey(self, col, row, piece):
+        return self.ZOBRIST[(col, row, piece)]
+
+
+    #> Creates the hash keys for every spot of a board of the given size, once.
+    #> Filled under a lock and never changed afterwards, so games on other
+    #  threads (server workers, pondering) always agree on every key.
+    @classmethod
+    def prepareZobrist(cls, dimension):
+        with cls.zobristLock:
+            if dimension <= cls.zobristSize:
+                return
+            for col in range(dimension):
+                for row in range(dimension):
+                    for piece in ["B", "W"]:
+                        if (col, row, piece) not in cls.ZOBRIST:
+                            cls.ZOBRIST[(col, row, piece)] = cls.zobristRandom.getrandbits(64)
+            cls.zobristSize = dimension
+
+
+    #> Recomputes every incremental index from self.state: the move history,
+    #  the position hash and the candidate set (empty spots next to a piece).
+    #> Must be called whenever self.state is replaced or edited directly.
+    def rebuildIndexes(self):
+        if self.dimension > self.zobristSize:
+            self.prepareZobrist(self.dimension)
+        self.history = [] # (col, row, piece) of every play() not yet undone.
+        self.posHash = 0
+        self.emptyCount = 0 # Number of empty spots; 0 means the board is full.
+        self.nearCount = [] # Number of pieces in the 8 spots around each spot.
+        for col in range(self.dimension):
+            self.nearCount.append([0] * self.dimension)
+        self.candidates = set()
+
+        for col in range(self.dimension):
+            for row in range(self.dimension):
+                piece = self.state[col][row]
+                if piece == self.BLANK:
+                    self.emptyCount += 1
+                else:
+                    self.posHash ^= self.zobristKey(col, row, piece)
+                    self.updateNear(col, row, 1)
+        if self.player == "W": # Black moves first, so play() toggles this in.
+            self.posHash ^= self.SIDEKEY
+        for col in range(self.dimension):
+            for row in range(self.dimension):
+                if self.nearCount[col][row] > 0 and self.state[col][row] == self.BLANK:
+                    self.candidates.add((col, row))
+
+
+    #> Adds change (1 or -1) to the neighbour count of the 8 spots around col/row
+    #  and keeps the candidate set in step with the counts.
+    def updateNear(self, col, row, change):
+        for nearCol in range(col-1, col+2):
+            if nearCol < 0 or nearCol > self.dimension-1:
+                continue
+            nearColumn = self.nearCount[nearCol]
+            stateColumn = self.state[nearCol]
+            for nearRow in range(row-1, row+2):
+                if nearRow < 0 or nearRow > self.dimension-1:
+                    continue
+                if nearCol == col and nearRow == row:
+                    continue
+                nearColumn[nearRow] += change
+                if stateColumn[nearRow] != self.BLANK:
+                    continue
+                if nearColumn[nearRow] > 0:
+                    self.candidates.add((nearCol, nearRow))
+                else:
+                    self.candidates.discard((nearCol, nearRow))
+
+
+    #> Places the current player's piece at col/row and passes the turn.
+    #> Updates the hash and candidate set in O(1); undo() restores them exactly.
+    #> Does not check that the move is valid or draw anything.
+    def play(self, col, row):
+        piece = self.player
+        self.state[col][row] = piece
+        self.history.append((col, row, piece))
+        self.emptyCount -= 1
+        self.posHash ^= self.zobristKey(col, row, piece) ^ self.SIDEKEY
+        self.candidates.discard((col, row))
+        self.updateNear(col, row, 1)
+
+        if piece == self.human:
+            self.player = self.comp
+        else:
+            self.player = self.human
+
+
+    #> Takes back the last play() and gives the turn back to whoever made it.
+    #> Returns the col/row of the removed piece.
+    def undo(self):
+        col, row, piece = self.history.pop()
+        self.state[col][row] = self.BLANK
+        self.emptyCount += 1
+        self.posHash ^= self.zobristKey(col, row, piece) ^ self.SIDEKEY
+        self.updateNear(col, row, -1)
+        if self.nearCount[col][row] > 0:
+            self.candidates.add((col, row))
+        self.player = piece
+        return col, row
+
+
+    #> Returns a copy of the game which can be searched without touching this one.
+    #> The copy has no graphics attached, so only the headless methods may be used.
+    def copyPosition(self):
+        other = copy.copy(self)
+        other.__dict__.pop("graphics", None)
+        other.__dict__.pop("ponderer", None)
+        other.__dict__.pop("autosaver", None)
+        other.state = [column[:] for column in self.state]
+        other.nearCount = [column[:] for column in self.nearCount]
+        other.history = self.history[:]
+        other.candidates = set(self.candidates)
+        other.mctsEngine = None # The search tree is not shared between copies.
+        return other
+
+
     #> Randomly selects the number 0 or 1. If 1, then the human plays first.
     #>> Since black always plays first, this means they are also black.
     #> Sets player, human and comp globals
@@ -97,7 +349,8 @@ class Logic:
     #> Takes the generalized pattern strings and converts them to correspond to
     #  the colour assignments for that game.
     #  Looks up the class variable "HARDPATS", but does not alter it.
-    #> Will include difficulty logic for final release
+    #> Also compiles the converted set into base-3 window lookup tables
+    #  (see gomoku_Patterns.py), which matchLine() uses to scan lines.
     def patternConverter(self):
         if self.diff == 0:
             selectedPats = self.NOPATS
@@ -123,11 +376,14 @@ class Logic:
             if newPattern != revPattern:
                 procPatterns.append(revPattern)
         #print(procPatterns) ###DEBUGGING###
+        compilePatterns(procPatterns)
         return procPatterns
 
 
     #> Checks that the given col and row are within the bounds of the 
     #  boardsize and space they represent is empty. 
+    #> Under rules with forbidden moves (Renju), also checks that the current
+    #  player is allowed to play there.
     #> Returns True if so, else False
     def isValidInput(self, col, row):
         for inst in [col, row]:
@@ -135,16 +391,26 @@ class Logic:
                 return False
         if self.state[col][row] != self.BLANK: # Checks that the space is empty
             return False
+        elif self.rules.hasForbidden:
+            return self.rules.forbiddenReason(self, col, row, self.player) == None
         else:
             return True
 
+
+    #> Returns True if the board is full, which ends the game in a draw.
+    def isDraw(self):
+        return self.emptyCount == 0
+
             
     #> Used by checkWin to check if there is a series of 5 pieces in a line.
     #> The line is extrapolated from the col / row of the player piece,
     #  along with the dY and dX (difCol, difRow).
     #> If there is a series of 5, returns a list of form 
     #  [True,start tuple, end tuple]; else, returns a single element list [False].
-    def checkLine(self, col, row, difCol,difRow):
+    #> piece defaults to the player whose turn it is.
+    def checkLine(self, col, row, difCol,difRow, piece=None):
+        if piece is None:
+            piece = self.player
         series = 1
         seqStart = "" # Endpoint position placeholders
         seqEnd = ""
@@ -165,7 +431,7 @@ class Logic:
                     break
 
                 # If the next piece doesn't match, that direction of the series ends
-                elif self.state[nextCol][nextRow] != self.player:
+                elif self.state[nextCol][nextRow] != piece:
                     if dir == -1:
                         seqEnd = (nextCol+difCol, nextRow+difRow)
                     else:
@@ -176,8 +442,8 @@ class Logic:
                 else:
                     series = series + 1
                     
-        # If the series is exactly 5, then the game is won.
-        if series == 5:
+        # The rules decide which series win (exactly 5 unless changed).
+        if self.rules.isWinningSeries(series, piece):
             return [True, seqStart, seqEnd]
         else:
             return [False]
@@ -187,7 +453,10 @@ class Logic:
     #  if any of the adjacent 8 spots match the piece just played. If so, check
     #  that line for a series of exactly 5. If the winning condition is met, calls 
     #  setWin() with the coordinates of the winning sequence endpoints.
-    def checkWin(self, col, row):
+    #> piece is the piece that was played; defaults to the current player.
+    def checkWin(self, col, row, piece=None):
+        if piece is None:
+            piece = self.player
         for checkCol in range(col-1,col+2):
             if checkCol < 0 or checkCol > self.dimension-1:
                 continue
@@ -200,37 +469,54 @@ class Logic:
                 elif checkCol == col and checkRow == row:
                     continue
                 # Moves on if the pieces don't match.
-                elif self.state[checkCol][checkRow] != self.player:
+                elif self.state[checkCol][checkRow] != piece:
                     continue
                     
                 else: # If this runs, the pieces being compared match.
                     # Col/row difference between the pieces; used to traverse the line
                     difCol = checkCol - col
                     difRow = checkRow - row
-                    result = self.checkLine(col, row, difCol, difRow)
+                    result = self.checkLine(col, row, difCol, difRow, piece)
                     if result[0]:
                         return [result[1], result[2]]
 
 
     #> Runs each time the computer needs to make a move. Makes the decision,
     #  checks if the input is valid, places the piece and updates the game state variable.
-    def computerMove(self):
+    #> prepared is a move already found by pondering, used instead of a search.
+    #> Afterwards, starts pondering on the human's likely replies.
+    def computerMove(self, prepared=None):
         if self.diff == 0: # If AI is off, don't play at all.
+            if self.player != self.human: # Keeps the side to move in the hash.
+                self.posHash ^= self.SIDEKEY
             self.player = self.human
             return
 
-        compEle = self.decisionMaker()
+        timeLimit = self.GUITIMELIMIT
+        if self.diff == self.MCTSDIFF:
+            timeLimit = self.MCTSTIMELIMIT
+        if prepared is not None and self.isValidInput(prepared[0], prepared[1]):
+            compEle = prepared
+        else:
+            compEle = self.decisionMaker(timeLimit)
+        if compEle == []: # Nowhere left to play.
+            self.graphics.setDraw()
+            return
         compCol = compEle[0]
         compRow = compEle[1]
-        colPos = compCol * self.cellSize # Converts indices to coordinates
-        rowPos = compRow * self.cellSize
-        
-        self.graphics.stampPiece(colPos,rowPos)
-        self.state[compCol][compRow] = self.player
-        winResult = self.checkWin(compCol, compRow)
+
+        self.graphics.stampPiece(compCol, compRow)
+        self.graphics.highlightPiece(compCol, compRow)
+        self.play(compCol, compRow) # Also passes the turn to the human.
+        winResult = self.checkWin(compCol, compRow, self.comp)
         if winResult != None:
             self.graphics.setWin(winResult[0], winResult[1])
-        self.player = self.human
+        elif self.isDraw():
+            self.graphics.setDraw()
+        else:
+            if self.ponderer is None:
+                self.ponderer = Ponderer(self.PONDERCPU)
+            self.ponderer.start(self, timeLimit)
 
 
     #> Converts the x or y position of a click to the index of a col/row list.
@@ -254,22 +540,61 @@ class Logic:
             self.graphics.displayMessage("   You  cannot\n    place  your\n   piece there")
             return
 
-        humanXPos = humanCol * self.cellSize
-        humanYPos = humanRow * self.cellSize
-
+        # Picks up the answer pondering prepared for this move, if any.
+        prepared = None
+        if self.ponderer is not None:
+            prepared = self.ponderer.take(humanCol, humanRow, self.posHash, self.diff, self.rules)
+            self.ponderer.stop() # Cancels its search, so the reply gets the whole core.
+        self.recovered = None # Playing on declines the resume offer.
 
         self.move = self.move + 1
         self.graphics.displayTurn() #Redraws the turn counter
-        self.graphics.stampPiece(humanXPos, humanYPos)
-        self.state[humanCol][humanRow] = self.player
+        self.graphics.stampPiece(humanCol, humanRow)
+        self.graphics.highlightPiece(humanCol, humanRow)
+        self.play(humanCol, humanRow) # Also passes the turn to the computer.
 
-        winResult = self.checkWin(humanCol, humanRow)
+        winResult = self.checkWin(humanCol, humanRow, self.human)
         if winResult != None:
             self.graphics.setWin(winResult[0], winResult[1])
+        elif self.isDraw():
+            self.graphics.setDraw()
 
         if not self.winState: # If the player just won, the computer shouldn't play
-            self.player = self.comp
-            self.computerMove()
+            self.computerMove(prepared)
+        self.autosave()
+
+
+    #> Takes back the human's last move and any computer reply after it, removing
+    #  only those pieces from the board. Bound to the "u" key.
+    #> Only moves played since the game was started or loaded can be undone.
+    def undoTurn(self):
+        if self.winState:
+            self.graphics.displayMessage("  You  cannot\n  undo  in  an\n ended  game")
+            return
+        humanMoves = 0
+        for col, row, piece in self.history:
+            if piece == self.human:
+                humanMoves += 1
+        if humanMoves == 0 or self.player != self.human:
+            self.graphics.displayMessage("  Nothing  to\n      undo\n")
+            return
+
+        if self.ponderer is not None:
+            self.ponderer.stop(False)
+        while True:
+            col, row = self.undo()
+            self.graphics.clearPiece(col, row)
+            if self.player == self.human: # The human's own move was removed.
+                break
+        self.move = self.move - 1
+        self.graphics.displayTurn()
+
+        if len(self.history) != 0:
+            self.graphics.highlightPiece(self.history[-1][0], self.history[-1][1])
+        else:
+            self.graphics.highlightPiece(None, None)
+        self.graphics.displayMessage("  Move  undone\n")
+        self.autosave()
 
 
     #Traverses the 2D state list and returns a list containing strings which
@@ -392,6 +717,29 @@ class Logic:
                     return eleIndx
         
 
+    #> Looks for each pattern in a single line string, using the compiled
+    #  window lookup tables. Where a pattern's playable spot depends on the rest
+    #  of the line, calls elementChoice with the matched strings to find it.
+    #> Returns a list of [pattern index, element index] pairs. Results are
+    #  memoized in Logic.lineCache, keyed by the line and the pattern set.
+    #> Adds the windows the line takes to scan to self.evalCount, whether or
+    #  not the result came from the cache.
+    def matchLine(self, lineStr, patternKey):
+        key = (lineStr, patternKey)
+        cached = self.lineCache.get(key)
+        if cached is not None:
+            self.evalCount += cached[1]
+            return cached[0]
+
+        matches, windows = compilePatterns(patternKey).scanLine(lineStr)
+        self.evalCount += windows
+        for match in matches:
+            if match[1] is None:
+                match[1] = self.elementChoice(patternKey[match[0]], lineStr)
+        self.lineCache.put(key, (matches, windows))
+        return matches
+
+
     #> The entire board is deconstructed into strings which represent a complete
     #  vertical, horizontal or diagonal line. These strings are iterated through,
     #> looking for linear patterns on the board to find the playable moves.
@@ -404,20 +752,27 @@ class Logic:
         stringList = vertList + horiList + diagList
         posList = vertPosList + horiPosList + diagPosList
 
-        # Looks for each pattern in each line. If found, calls elementChoice
-        # with the matched strings to find the index of a playable (blank) spot.
+        # Looks up the matches in each line and converts the element index of each
+        # playable (blank) spot to its coordinates.
         # Appends the coordinates, along with the pattern index (rank), to a list.
+        # Stops scanning once the deadline passes and ranks what was found so far.
+        patternKey = tuple(self.playPatterns)
         choices = []
         for lineIndx in range(len(stringList)):
+            if self.isPastDeadline():
+                break
             lineStr = stringList[lineIndx]
-            for patternIndx in range(len(self.playPatterns)):
-                patternStr = self.playPatterns[patternIndx]
-                if patternStr in lineStr:
-                    selIndx = self.elementChoice(patternStr, lineStr)
-                    selElem = posList[lineIndx][selIndx] # Returns col/row list.
-                    choices.append([patternIndx, selElem])
+            for patternIndx, selIndx in self.matchLine(lineStr, patternKey):
+                selElem = posList[lineIndx][selIndx] # Returns col/row list.
+                choices.append([patternIndx, selElem])
 
         choices.sort() # Sorted so the "best" (lowest pattern index) is first.
+        if self.rules.hasForbidden: # Drops the spots the AI may not play.
+            allowed = []
+            for entry in choices:
+                if self.rules.forbiddenReason(self, entry[1][0], entry[1][1], self.player) == None:
+                    allowed.append(entry)
+            choices = allowed
         # Chooses the coordinates for the first entry in choice
         choice = []
         if len(choices) != 0:
@@ -446,6 +801,8 @@ class Logic:
             startCol, startRow = self.minDistanceFromPlayer(playerPieces, compPieces)
 
         for check in range(30): # Gets 30 attempts to find a solution, else random
+            if self.isPastDeadline():
+                break
             pseudoRandRow = startRow + random.randrange(-1,2) # rand in [-1,0,1]
             pseudoRandCol = startCol + random.randrange(-1,2,2) # rand in [-1,1]
             if self.isValidInput(pseudoRandCol, pseudoRandRow):
@@ -454,10 +811,33 @@ class Logic:
                 startCol = compPieces[0][0]
                 startRow = compPieces[0][1]
 
-        # This block only runs if no viable solution is found in 20 tries.
-        randCol = random.randrange(self.dimension)
-        randRow = random.randrange(self.dimension)
-        return [randCol, randRow]
+        # This block only runs if no viable solution is found in 30 tries, or
+        # the deadline has passed. Picks from the empty spots next to the most
+        # pieces (self.candidates), so the move stays in the fight.
+        nearby = []
+        mostNear = 0
+        for col, row in self.candidates:
+            if not self.isValidInput(col, row):
+                continue
+            if self.nearCount[col][row] > mostNear:
+                nearby = []
+                mostNear = self.nearCount[col][row]
+            if self.nearCount[col][row] == mostNear:
+                nearby.append([col, row])
+        if len(nearby) != 0:
+            nearby.sort() # Set order is arbitrary; keeps random picks repeatable.
+            return random.choice(nearby)
+
+        # Otherwise picks from all the empty spots so the answer is always a
+        # legal move. Returns an empty list if there is none (a full board).
+        emptyList = []
+        for col in range(self.dimension):
+            for row in range(self.dimension):
+                if self.isValidInput(col, row):
+                    emptyList.append([col, row])
+        if len(emptyList) != 0:
+            return random.choice(emptyList)
+        return []
 
 
     #> Different function to determine the position of the computer piece
@@ -500,9 +880,44 @@ class Logic:
         return humanList, compList
 
 
+    #> Returns True once the deadline set by decisionMaker() has passed.
+    #> Always False when the AI was given no time limit.
+    #> Also returns True once cancelEvent is set, so the search is cut short.
+    def isPastDeadline(self):
+        if self.cancelEvent is not None and self.cancelEvent.is_set():
+            self.timedOut = True
+            return True
+        if self.deadline is None:
+            return False
+        if time.perf_counter() >= self.deadline:
+            self.timedOut = True
+            return True
+        return False
+
+
     #> Checks if there are any patterns to play off of; if not, uses the
     #  pseudoRandomPlay function to find a spot to play.
-    def decisionMaker(self):
+    #> Returns an empty list if there is nowhere left to play.
+    #> timeLimit is the number of seconds the AI may spend (None = unlimited).
+    #  When it runs out, the best move found so far is returned. The number of
+    #  line/pattern checks made is left in self.evalCount.
+    def decisionMaker(self, timeLimit=None):
+        if timeLimit is None:
+            self.deadline = None
+        else:
+            self.deadline = time.perf_counter() + timeLimit
+        self.evalCount = 0
+        self.timedOut = False
+
+        # The tree search reports its playouts as the evaluation count.
+        if self.diff == self.MCTSDIFF:
+            if self.mctsEngine is None:
+                self.mctsEngine = MCTS()
+            result = self.mctsEngine.chooseMove(self, timeLimit)
+            self.evalCount = self.mctsEngine.lastPlayouts
+            if result != [] and self.isValidInput(result[0], result[1]):
+                return result
+
         result = self.lookUpPatterns()
         humanPieces, compPieces = self.findPieces()
 
@@ -520,21 +935,128 @@ class Logic:
             self.graphics.displayMessage("clear")
             self.graphics.displayMessage("  You  cannot\n     save  this\n ended  game")
             return
-            
-        saved = open("gomoku_Save.gmk","w")
+
+        # Written at once, so the message reports whether it worked.
+        try:
+            writeAtomic("gomoku_Save.gmk", self.serializeGame(), self.AUTOSAVEFSYNC)
+        except OSError:
+            self.graphics.displayMessage("clear")
+            self.graphics.displayMessage("  The  game\n  could  not\n  be  saved!")
+            return
+        self.graphics.displayMessage("  Game  Saved\n")
+
+
+    #> Queues a checkpoint of the game at AUTOSAVEPATH, or its removal once
+    #  the game is over. Only saves while the human is to move, since that is
+    #  the position a save describes.
+    #>> Does nothing while a recovered checkpoint is on offer, so the fresh
+    #   game cannot replace it before the human has chosen.
+    def autosave(self):
+        if self.recovered is not None:
+            return
+        if self.autosaver is None:
+            self.autosaver = AutoSaver(fsync=self.AUTOSAVEFSYNC)
+        if self.winState:
+            self.autosaver.discard(self.AUTOSAVEPATH)
+        elif self.player == self.human:
+            self.autosaver.submit(self.AUTOSAVEPATH, self.serializeGame(), True)
+
+
+    #> Returns True if text is a save restoreGame() accepts.
+    def isGoodSave(self, text):
+        try:
+            Logic(5).restoreGame(text)
+        except ValueError:
+            return False
+        return True
+
+
+    #> Returns the text of the newest good checkpoint, or None if there is none.
+    def findAutosave(self):
+        return findCheckpoint(self.AUTOSAVEPATH, self.isGoodSave)
+
+
+    #> Loads the checkpoint found at start-up (self.recovered). Invoked through
+    #  the keyboard binding assigned to the "r" key, which the start-up
+    #  message offers until a move is played or another game is started.
+    def resumeAutosave(self):
+        text = self.recovered
+        if text is None:
+            self.graphics.displayMessage("  No  autosave\n   was  found!\n")
+            return
+        self.loadSaveText(text)
+        self.graphics.displayMessage(" Game  Resumed\n")
+
+
+    #> Returns the text of a save file for the current game, as written by saveGame().
+    #> The first line stores config variables: move, dimension, human, diff
+    #  and rules.
+    #>> Every line after that stores one row of the 2D array "state".
+    def serializeGame(self):
         configSave = "move,"+str(self.move)+";dimension,"+str(self.dimension)+\
-                     ";human,"+str(self.human)+";diff,"+str(self.diff)+"\n"
-        saved.write(configSave)
+                     ";human,"+str(self.human)+";diff,"+str(self.diff)+\
+                     ";rules,"+self.rules.name+"\n"
+        lines = [configSave]
 
         # Iterates through each row of the state list, accumulates the elements
-        # in each col into a string, then writes that string to the file.
+        # in each col into a string, then adds that string to the file text.
         for row in range(self.dimension):
             printedLine = ""
             for col in range(self.dimension):
                 printedLine = printedLine + self.state[col][row]
-            saved.write(printedLine+"\n")
-        saved.close()
-        self.graphics.displayMessage("  Game  Saved\n")
+            lines.append(printedLine+"\n")
+        return "".join(lines)
+
+
+    #> Headless counterpart of loadGame(): replaces this game with the one in
+    #  the save text produced by serializeGame(). Does not touch the graphics.
+    #> Raises ValueError if the text is not a valid save.
+    def restoreGame(self, text):
+        lines = text.splitlines()
+        if len(lines) == 0:
+            raise ValueError("empty save")
+
+        config = {}
+        for pair in lines[0].split(";"):
+            pair = pair.split(",")
+            if len(pair) != 2:
+                raise ValueError("bad config entry: " + ",".join(pair))
+            config[pair[0]] = pair[1]
+        for var in ["move", "dimension", "human", "diff"]:
+            if var not in config:
+                raise ValueError("missing config entry: " + var)
+        if config["human"] not in ["B", "W"]:
+            raise ValueError("bad human colour: " + config["human"])
+        rules = config.get("rules", "standard") # Older saves have no rules entry.
+        if rules not in RULESETS:
+            raise ValueError("unknown rules: " + rules)
+
+        dimension = int(config["dimension"])
+        rows = lines[1:]
+        if len(rows) != dimension:
+            raise ValueError("expected " + str(dimension) + " rows, found " + str(len(rows)))
+        for line in rows:
+            if len(line) != dimension or line.strip(self.BLANK + "BW") != "":
+                raise ValueError("bad board row: " + line)
+
+        self.dimension = dimension
+        self.move = int(config["move"])
+        self.diff = int(config["diff"])
+        self.human = config["human"]
+        if self.human == "B":
+            self.comp = "W"
+        else:
+            self.comp = "B"
+        self.player = self.human # As in loadGame(), the human is always to move.
+        self.winState = False
+        self.rules = RULESETS[rules]
+
+        self.state = self.stateConstructor()
+        for row in range(dimension):
+            for col in range(dimension):
+                self.state[col][row] = rows[row][col]
+        self.playPatterns = self.patternConverter()
+        self.rebuildIndexes()
 
 
     #> Interprets the config line passed by loadGame() and clears previous game info.
@@ -543,6 +1065,7 @@ class Logic:
             self.graphics.toggleWelcome()
 
         config = config[:len(config)-1] # Removes the newline characters.
+        self.rules = RULESETS["standard"] # Older saves have no rules entry.
         pairs = config.split(";") #> Puts the var/value pairs in a list.
         for entry in range(len(pairs)):
             # Separates the var/values and places them in a nested list
@@ -560,6 +1083,8 @@ class Logic:
             elif var == "diff":
                 self.diff = int(val)
                 self.graphics.displayDiff()
+            elif var == "rules" and val in RULESETS:
+                self.rules = RULESETS[val]
             elif var == "human":
                 if val == "B":
                     self.human = "B"
@@ -573,35 +1098,39 @@ class Logic:
                 
     #> Looks for the file "Gomokusave.gmk" and tries to load a previous save.
     #> If the file is not found, an error message displays in the Turtle window.
+    #> A save which cannot be read or parsed counts as missing, and the board
+    #  is left as it was.
     def loadGame(self):
-        try:
-            loaded = open("gomoku_Save.gmk","r")
-
-            config = loaded.readline() # Reads the config line.
-            self.loadConfig(config) # Parses the config line and performs setup.
-            self.initializeNewGame("load")
-
-            row = 0 # Sets up an accumulator to count the row the file line represents.
-            for line in loaded:
-                line = line[:len(line)-1] # Removes the newline characters.
-                for col in range(len(line)):
-                    ele = line[col]
-                    # Places the value of the line entry into the state list.
-                    self.state[col][row] = ele
-                    if ele != self.BLANK: # If it is blank it must be a player's.
-                        # Sets the player var so the correct piece is stamped.
-                        self.player = ele
-                        colPos = col * self.cellSize
-                        rowPos = row * self.cellSize
-                        self.graphics.stampPiece(colPos, rowPos)
-                row += 1
-
-            loaded.close()
-            self.player = self.human # Since the computer takes almost no time to move.
-            self.graphics.displayMessage("Game  Loaded\n")
-
-        except IOError:
+        text = readSave("gomoku_Save.gmk")
+        if text is None or not self.isGoodSave(text):
             self.graphics.displayMessage("  No  save  file\n   was  found!\n")
+            return
+        self.loadSaveText(text)
+        self.graphics.displayMessage("Game  Loaded\n")
+
+
+    #> Sets up the game and the board from the text of a save file.
+    def loadSaveText(self, text):
+        lines = text.splitlines(True)
+        config = lines[0] # Reads the config line.
+        self.loadConfig(config) # Parses the config line and performs setup.
+        self.initializeNewGame("load")
+
+        row = 0 # Sets up an accumulator to count the row the file line represents.
+        for line in lines[1:]:
+            line = line[:len(line)-1] # Removes the newline characters.
+            for col in range(len(line)):
+                ele = line[col]
+                # Places the value of the line entry into the state list.
+                self.state[col][row] = ele
+                if ele != self.BLANK: # If it is blank it must be a player's.
+                    # Sets the player var so the correct piece is stamped.
+                    self.player = ele
+                    self.graphics.stampPiece(col, row)
+            row += 1
+
+        self.player = self.human # Since the computer takes almost no time to move.
+        self.rebuildIndexes()
 
             
     #> Uses the y value of the click to determine which button is being pressed.
@@ -0,0 +1,324 @@
+###
+### Monte Carlo tree search AI (UCT).
+###
+### Used by Logic.decisionMaker() when diff is Logic.MCTSDIFF. The search runs
+### on a flat bytearray copy of the position (see gomoku_Board.py):
+###     > Moves are legal if the spot is empty, as in Logic.isValidInput().
+###     > A move wins if game.rules.isWinningSeries() accepts the series it
+###       makes, as in Logic.checkLine(), and only the 4 lines through the new
+###       piece are checked.
+###     > Moves (in the tree and in playouts) are restricted to empty spots next
+###       to an existing piece. Moves the rules forbid (black's under renju)
+###       are left out of the tree; playouts stay unchecked, as a check on
+###       every random move would cost more than the playout itself.
+### The tree is kept between turns: on the next call the subtree reached by the
+### moves played since is reused as the new root.
+###
+
+import math
+import random
+import time
+from gomoku_Board import Board
+
+
+#> One position in the search tree, reached by playing move (a flat index).
+class Node:
+    __slots__ = ("move", "mover", "parent", "children", "untried",
+                 "visits", "wins", "winner")
+
+    #> mover is the Board code of the player who played move.
+    def __init__(self, move, mover, parent):
+        self.move = move
+        self.mover = mover
+        self.parent = parent
+        self.children = {} # Flat index -> Node.
+        self.untried = None # Moves not expanded yet; filled on the first visit.
+        self.visits = 0
+        self.wins = 0.0 # From the point of view of mover; draws count 0.5.
+        self.winner = None # Board code of the winner if move ended the game.
+
+
+    #> Returns the child with the best UCT score.
+    def selectChild(self, exploration):
+        logVisits = math.log(self.visits)
+        bestScore = -1.0
+        bestChild = None
+        for child in self.children.values():
+            score = child.wins/child.visits + exploration*math.sqrt(logVisits/child.visits)
+            if score > bestScore:
+                bestScore = score
+                bestChild = child
+        return bestChild
+
+
+class MCTS:
+    DRAW = 0 # "Winner" code used for drawn playouts.
+
+    #> playouts: the most playouts to run per move.
+    #> maxPlayoutMoves: playouts longer than this are scored as draws.
+    def __init__(self, playouts=3000, exploration=1.4, maxPlayoutMoves=120):
+        self.playouts = playouts
+        self.exploration = exploration
+        self.maxPlayoutMoves = maxPlayoutMoves
+
+        self.dimension = None
+        self.rules = None # Rule set of the game searched; the tree is only kept for the same one.
+        self.root = None
+        self.rootCells = None # Position at the root, to check tree reuse.
+        self.rootHistory = []
+
+        self.lastPlayouts = 0 # Stats for the last search.
+        self.lastRate = 0.0 # Playouts per second.
+        self.reusedVisits = 0 # Visits carried over from the previous search.
+
+
+    #> Precomputes, for every spot, its neighbours and the spots along each of
+    #  the 4 line directions, so no bounds checks are needed during the search.
+    def buildTables(self, dimension):
+        self.dimension = dimension
+        self.neighbours = []
+        self.rays = []
+        for col in range(dimension):
+            for row in range(dimension):
+                near = []
+                for difCol in [-1, 0, 1]:
+                    for difRow in [-1, 0, 1]:
+                        if (difCol != 0 or difRow != 0) and \
+                           0 <= col+difCol < dimension and 0 <= row+difRow < dimension:
+                            near.append((col+difCol)*dimension + row+difRow)
+                self.neighbours.append(near)
+
+                lines = []
+                for difCol, difRow in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+                    halves = []
+                    for dir in [-1, 1]:
+                        half = []
+                        for step in range(1, 6):
+                            nextCol = col + dir*step*difCol
+                            nextRow = row + dir*step*difRow
+                            if not (0 <= nextCol < dimension and 0 <= nextRow < dimension):
+                                break
+                            half.append(nextCol*dimension + nextRow)
+                        halves.append(half)
+                    lines.append(halves)
+                self.rays.append(lines)
+
+
+    #> Returns True if the piece at indx is part of a winning series under
+    #  self.rules. Series longer than 11 are counted as 11, which is still an
+    #  overline.
+    def isWin(self, cells, indx, code):
+        piece = Board.PIECES[code]
+        for halves in self.rays[indx]:
+            series = 1
+            for half in halves:
+                for nextIndx in half:
+                    if cells[nextIndx] != code:
+                        break
+                    series += 1
+            if series >= 5 and self.rules.isWinningSeries(series, piece):
+                return True
+        return False
+
+
+    #> Returns the moves code may play: candidateMoves() without the spots
+    #  the rules forbid.
+    def legalMoves(self, cells, code):
+        moves = self.candidateMoves(cells)
+        if self.rules.hasForbidden:
+            allowed = []
+            for indx in moves:
+                if self.rules.forbiddenCell(cells, self.dimension, indx, code) == None:
+                    allowed.append(indx)
+            moves = allowed
+        return moves
+
+
+    #> Returns the playable spots: empty spots next to a piece, or the centre
+    #  of an empty board.
+    def candidateMoves(self, cells):
+        moves = []
+        neighbours = self.neighbours
+        for indx in range(len(cells)):
+            if cells[indx] != 0:
+                continue
+            for near in neighbours[indx]:
+                if cells[near] != 0:
+                    moves.append(indx)
+                    break
+        if len(moves) == 0 and cells.count(0) == len(cells):
+            centre = self.dimension//2
+            moves.append(centre*self.dimension + centre)
+        return moves
+
+
+    #> Returns a move which wins at once for toMove, else one which blocks an
+    #  immediate win for the opponent, else None. Only moves toMove may play
+    #  are considered.
+    def forcedMove(self, cells, toMove):
+        moves = self.legalMoves(cells, toMove)
+        for code in [toMove, 3 - toMove]:
+            for indx in moves:
+                cells[indx] = code
+                won = self.isWin(cells, indx, code)
+                cells[indx] = 0
+                if won:
+                    return indx
+        return None
+
+
+    #> Finds the node for the current position in the previous tree, if the
+    #  game has only moved forward since; otherwise starts a new tree.
+    def findRoot(self, game, cells, toMove):
+        history = game.history
+        count = len(self.rootHistory)
+        if self.root is not None and self.dimension == game.dimension and \
+           self.rules is game.rules and history[:count] == self.rootHistory:
+            node = self.root
+            replay = self.rootCells[:]
+            for col, row, piece in history[count:]:
+                indx = col*self.dimension + row
+                replay[indx] = Board.CODES[piece]
+                node = node.children.get(indx)
+                if node is None:
+                    break
+            if node is not None and replay == cells:
+                node.parent = None # Lets the rest of the old tree be freed.
+                return node
+
+        if self.dimension != game.dimension:
+            self.buildTables(game.dimension)
+        self.rules = game.rules
+        return Node(None, 3 - toMove, None)
+
+
+    #> Chooses a move for the player to move in game (a Logic instance).
+    #> Runs up to self.playouts playouts, or until timeLimit seconds have passed.
+    #> Returns [col, row].
+    def chooseMove(self, game, timeLimit=None):
+        board = game.toBoard()
+        cells = board.cells
+        root = self.findRoot(game, cells, board.toMove)
+
+        # Wins on the spot and blocks of the opponent's win need no search.
+        forced = self.forcedMove(cells, board.toMove)
+        if forced is not None:
+            self.lastPlayouts = 0
+            self.root = None
+            return [forced // self.dimension, forced % self.dimension]
+        self.reusedVisits = root.visits
+
+        start = time.perf_counter()
+        deadline = None
+        if timeLimit is not None:
+            deadline = start + timeLimit
+
+        playouts = 0
+        while playouts < self.playouts:
+            if deadline is not None and time.perf_counter() >= deadline and root.visits > 0:
+                break
+            if game.cancelEvent is not None and game.cancelEvent.is_set():
+                break
+            self.iterate(root, cells)
+            playouts += 1
+
+        elapsed = time.perf_counter() - start
+        self.lastPlayouts = playouts
+        self.lastRate = playouts / max(elapsed, 1e-9)
+
+        self.root = root
+        self.rootCells = cells[:]
+        self.rootHistory = game.history[:]
+
+        bestVisits = -1
+        bestMove = None
+        for move, child in root.children.items():
+            if child.visits > bestVisits:
+                bestVisits = child.visits
+                bestMove = move
+        if bestMove is None: # No legal moves; the board is full.
+            return []
+        return [bestMove // self.dimension, bestMove % self.dimension]
+
+
+    #> Runs one selection / expansion / playout / backpropagation pass.
+    #> cells is restored before returning.
+    def iterate(self, root, cells):
+        placed = []
+        node = root
+        # Selection: walks down fully expanded nodes by UCT score.
+        while node.winner is None and node.untried is not None and \
+              len(node.untried) == 0 and len(node.children) != 0:
+            node = node.selectChild(self.exploration)
+            cells[node.move] = node.mover
+            placed.append(node.move)
+
+        # Expansion: adds one untried move as a new child.
+        if node.winner is None:
+            if node.untried is None:
+                node.untried = self.legalMoves(cells, 3 - node.mover)
+                random.shuffle(node.untried)
+            if len(node.untried) != 0:
+                move = node.untried.pop()
+                child = Node(move, 3 - node.mover, node)
+                node.children[move] = child
+                cells[move] = child.mover
+                placed.append(move)
+                if self.isWin(cells, move, child.mover):
+                    child.winner = child.mover
+                node = child
+            else:
+                node.winner = self.DRAW # Nothing left to play.
+
+        if node.winner is not None:
+            winner = node.winner
+        else:
+            winner = self.playout(cells, 3 - node.mover, placed)
+
+        # Backpropagation.
+        while node is not None:
+            node.visits += 1
+            if winner == node.mover:
+                node.wins += 1.0
+            elif winner == self.DRAW:
+                node.wins += 0.5
+            node = node.parent
+
+        for indx in placed:
+            cells[indx] = 0
+
+
+    #> Plays random moves next to existing pieces until someone wins.
+    #> Every spot played is appended to placed so the caller can clear it.
+    #> Returns the winner's Board code, or DRAW.
+    def playout(self, cells, toMove, placed):
+        moves = self.candidateMoves(cells)
+        listed = bytearray(len(cells))
+        for indx in moves:
+            listed[indx] = 1
+        neighbours = self.neighbours
+        rand = random.random
+
+        for ply in range(self.maxPlayoutMoves):
+            indx = -1
+            while len(moves) != 0:
+                pick = int(rand() * len(moves))
+                indx = moves[pick]
+                moves[pick] = moves[-1]
+                moves.pop()
+                if cells[indx] == 0:
+                    break
+                indx = -1
+            if indx == -1:
+                return self.DRAW
+
+            cells[indx] = toMove
+            placed.append(indx)
+            if self.isWin(cells, indx, toMove):
+                return toMove
+            for near in neighbours[indx]:
+                if cells[near] == 0 and not listed[near]:
+                    listed[near] = 1
+                    moves.append(near)
+            toMove = 3 - toMove
+        return self.DRAW
@@ -0,0 +1,115 @@
+#> Lookup tables for the AI's pattern matching.
+#> Every pattern is a short window (4 or 5 spots) over {blank, black, white},
+#  so a window can be encoded as a base-3 number: blank 0, black 1, white 2.
+#  For each window length, a table indexed by that number (at most 3**5 = 243
+#  entries) lists the patterns which match the window exactly. Scanning a line
+#  is then one rolling multiply/add and one table read per spot.
+
+DIGITS = {"X": 0, "B": 1, "W": 2}
+
+
+#> Returns the base-3 code of a window string.
+def windowCode(window):
+    code = 0
+    for letter in window:
+        code = code*3 + DIGITS[letter]
+    return code
+
+
+#> Returns the code of a window after the spot at position (0 = leftmost)
+#  changes from oldLetter to newLetter, e.g. when a piece is placed.
+def updateCode(code, length, position, oldLetter, newLetter):
+    weight = 3 ** (length - 1 - position)
+    return code + (DIGITS[newLetter] - DIGITS[oldLetter]) * weight
+
+
+#> Returns the position of the first blank in a window code, or None.
+def blankIndex(code, length):
+    for position in range(length):
+        if code // 3 ** (length - 1 - position) % 3 == DIGITS["X"]:
+            return position
+    return None
+
+
+class PatternTables:
+    #> Compiles a list of game-specific pattern strings (e.g. from
+    #  Logic.patternConverter()). Pattern indices are kept, so the ranks match.
+    def __init__(self, patterns, blank="X"):
+        self.patterns = list(patterns)
+        self.tables = {} # Window length -> list of pattern-index tuples.
+        self.offsets = [] # Spot elementChoice() would pick, or None if it depends on the line.
+
+        for patternIndx in range(len(self.patterns)):
+            pattern = self.patterns[patternIndx]
+            length = len(pattern)
+            if length not in self.tables:
+                self.tables[length] = [()] * (3 ** length)
+            code = windowCode(pattern)
+            self.tables[length][code] = self.tables[length][code] + (patternIndx,)
+            self.offsets.append(self.patternOffset(pattern, blank))
+        self.lengths = sorted(self.tables)
+
+
+    #> Returns the index of the first blank with a piece next to it within the
+    #  pattern, which is what elementChoice() picks. Returns None when the
+    #  answer could depend on the spot just before the pattern, in which case the
+    #  caller has to look at the line itself.
+    def patternOffset(self, pattern, blank):
+        for indx in range(len(pattern)):
+            if pattern[indx] != blank:
+                continue
+            for adjIndx in [indx-1, indx+1]:
+                if 0 <= adjIndx < len(pattern) and pattern[adjIndx] != blank:
+                    return indx
+            if indx == 0:
+                return None
+        return None
+
+
+    #> Returns the pattern indices which match a window of the given length.
+    def lookUp(self, length, code):
+        return self.tables[length][code]
+
+
+    #> Finds the first occurrence of every pattern in lineStr.
+    #> Returns a list of [pattern index, element index] pairs sorted by pattern
+    #  index, plus the number of windows scanned. The element index is None if
+    #  the pattern's offset depends on the line (see patternOffset()).
+    def scanLine(self, lineStr):
+        digits = [DIGITS[letter] for letter in lineStr]
+        found = {}
+        windows = 0
+        for length in self.lengths:
+            table = self.tables[length]
+            high = 3 ** (length - 1)
+            code = 0
+            for pos in range(len(digits)):
+                code = (code % high)*3 + digits[pos] # Rolls the window one spot.
+                if pos < length-1:
+                    continue
+                windows += 1
+                for patternIndx in table[code]:
+                    if patternIndx not in found:
+                        found[patternIndx] = pos - length + 1
+
+        matches = []
+        for patternIndx in sorted(found):
+            offset = self.offsets[patternIndx]
+            if offset is None:
+                matches.append([patternIndx, None])
+            else:
+                matches.append([patternIndx, found[patternIndx] + offset])
+        return matches, windows
+
+
+compiledTables = {} # Pattern tuple -> PatternTables, shared by all games.
+
+
+#> Returns the compiled tables for a pattern list, compiling it only once.
+def compilePatterns(patterns):
+    key = tuple(patterns)
+    tables = compiledTables.get(key)
+    if tables is None:
+        tables = PatternTables(key)
+        compiledTables[key] = tables
+    return tables
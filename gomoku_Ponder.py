@@ -0,0 +1,116 @@
+#> Background analysis ("pondering") while the human is thinking.
+#> After the computer moves, a thread works on a copy of the game: for each
+#  likely human reply it plays the reply and runs the computer's normal
+#  search, keeping the answer keyed by the reply. When the human plays one of
+#  those moves, the answer is ready; any other move is searched as usual.
+#> Answers are only used for the exact position, difficulty and rules they
+#  were prepared for, so a stale cache can never produce a wrong move.
+
+import threading
+import time
+
+
+class Ponderer:
+    #> cpuLimit is the fraction of one core the thread may use (0 disables
+    #  pondering); it sleeps between searches to stay under it.
+    #> maxReplies is the most human replies analysed per turn.
+    def __init__(self, cpuLimit=0.5, maxReplies=12):
+        self.cpuLimit = cpuLimit
+        self.maxReplies = maxReplies
+        self.thread = None
+        self.stopEvent = threading.Event()
+        self.lock = threading.Lock()
+        self.basis = None # (posHash, diff, rules) the answers were prepared for.
+        self.answers = {} # (col, row) of a human reply -> [col, row] of the answer.
+        self.hits = 0
+        self.misses = 0
+
+
+    #> Starts pondering on the position in game, where the human is to move.
+    #> Must be called from the thread which owns game, as it takes a copy.
+    #  Callers stop() the previous pondering before their own search, so it
+    #  does not compete for the core; here it is only told to stop.
+    def start(self, game, timeLimit):
+        self.stop(False)
+        if self.cpuLimit <= 0 or game.winState or game.isDraw():
+            return
+        position = game.copyPosition()
+        with self.lock:
+            self.basis = (game.posHash, game.diff, game.rules.name)
+            self.answers = {}
+        self.stopEvent = threading.Event()
+        position.cancelEvent = self.stopEvent # Ends the copy's searches early.
+        self.thread = threading.Thread(target=self.run, name="ponder", daemon=True,
+                                       args=(position, timeLimit, self.basis, self.stopEvent))
+        self.thread.start()
+
+
+    #> Tells the thread to stop; the search it is in the middle of sees the
+    #  event and returns early. With wait, also waits for it to finish.
+    def stop(self, wait=True):
+        self.stopEvent.set()
+        if wait and self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+
+    #> Returns the prepared answer to the human playing col/row in the position
+    #  described by posHash / diff / rules, or None if there is none.
+    def take(self, col, row, posHash, diff, rules):
+        with self.lock:
+            answer = None
+            if self.basis == (posHash, diff, rules.name):
+                answer = self.answers.get((col, row))
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+
+    #> Returns the human replies worth preparing for, most likely first: the
+    #  move the computer itself would play for the human, then the empty
+    #  spots with the most pieces around them.
+    def likelyReplies(self, game, timeLimit):
+        replies = []
+        game.human, game.comp = game.comp, game.human # Searches as the human.
+        game.playPatterns = game.patternConverter()
+        try:
+            guess = game.decisionMaker(timeLimit)
+        finally:
+            game.human, game.comp = game.comp, game.human
+            game.playPatterns = game.patternConverter()
+        if guess != []:
+            replies.append((guess[0], guess[1]))
+
+        nearby = sorted(game.candidates, key=lambda spot: (-game.nearCount[spot[0]][spot[1]], spot))
+        for spot in nearby:
+            if len(replies) >= self.maxReplies:
+                break
+            if spot not in replies and game.isValidInput(spot[0], spot[1]):
+                replies.append(spot)
+        return replies
+
+
+    #> Thread body: prepares an answer for each likely reply until stopped.
+    def run(self, game, timeLimit, basis, stopEvent):
+        for col, row in self.likelyReplies(game, timeLimit):
+            if stopEvent.is_set():
+                return
+            start = time.perf_counter()
+            game.play(col, row)
+            answer = None
+            if game.checkWin(col, row, game.human) == None and not game.isDraw():
+                answer = game.decisionMaker(timeLimit)
+            game.undo()
+            if stopEvent.is_set(): # The answer came from a search cut short.
+                return
+            if answer is not None and answer != []:
+                with self.lock:
+                    if self.basis != basis:
+                        return
+                    self.answers[(col, row)] = answer
+            # Rests so that busy time / total time stays at cpuLimit.
+            busy = time.perf_counter() - start
+            if self.cpuLimit < 1 and stopEvent.wait(busy * (1 - self.cpuLimit) / self.cpuLimit):
+                return
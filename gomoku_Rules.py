@@ -0,0 +1,203 @@
+#> Rule variants for deciding wins and forbidden moves.
+#> Logic keeps one of these in self.rules:
+#>> FreestyleRules: a series of 5 or more wins.
+#>> StandardRules:  a series of exactly 5 wins (the original game's rule).
+#>> RenjuRules:     white wins with 5 or more; black wins with exactly 5 and
+#                   may not play an overline, a double-four or a double-three.
+#> Forbidden moves are found by looking only at the 4 lines through the move,
+#  up to 5 spots either way, so a check costs the same on any board size. The
+#  check is local, not incremental: nothing is kept between checks or updated
+#  by play() / undo(). Instead, lines with too few black pieces to form a
+#  three, four or overline are skipped before any pattern is analysed, so most
+#  checks end after reading the 4 lines.
+
+from gomoku_Board import Board
+
+OWN = "O" # Letters used in the line segments analysed below.
+EMPTY = "."
+OTHER = "#" # Opponent piece or off the board.
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+REACH = 5 # Spots looked at on each side of the move.
+
+
+class FreestyleRules:
+    name = "freestyle"
+    hasForbidden = False
+
+    #> Returns True if a series of this length made by piece wins.
+    def isWinningSeries(self, series, piece):
+        return series >= 5
+
+
+    #> Returns the reason col/row is forbidden for piece, or None if it is allowed.
+    def forbiddenReason(self, game, col, row, piece):
+        return None
+
+
+    #> Same as forbiddenReason() for the spot indx of a flat Board-style cell
+    #  array (as searched by gomoku_MCTS.py), where code is a Board cell code.
+    def forbiddenCell(self, cells, dimension, indx, code):
+        return None
+
+
+class StandardRules(FreestyleRules):
+    name = "standard"
+
+    def isWinningSeries(self, series, piece):
+        return series == 5
+
+
+class RenjuRules(FreestyleRules):
+    name = "renju"
+    hasForbidden = True
+
+    def isWinningSeries(self, series, piece):
+        if piece == "B":
+            return series == 5
+        return series >= 5
+
+
+    #> Black may not make an overline, two fours or two open threes at once,
+    #  unless the same move makes exactly five. White has no restrictions.
+    #> game must provide state, dimension and BLANK (i.e. a Logic instance).
+    #> Simplification: a three counts as open whenever it can become a straight
+    #  four; whether that four's own move would be forbidden is not checked.
+    def forbiddenReason(self, game, col, row, piece):
+        if piece != "B":
+            return None
+        state = game.state
+        return self.forbiddenLines(lambda lineCol, lineRow: state[lineCol][lineRow],
+                                   game.dimension, col, row, "B", game.BLANK)
+
+
+    def forbiddenCell(self, cells, dimension, indx, code):
+        if code != Board.BLACK:
+            return None
+        return self.forbiddenLines(lambda lineCol, lineRow: cells[lineCol*dimension + lineRow],
+                                   dimension, indx // dimension, indx % dimension,
+                                   Board.BLACK, Board.EMPTY)
+
+
+    #> Checks a black move at col/row, where pieceAt(col, row) returns what is
+    #  on a spot and own / blank are the values for black and an empty spot.
+    def forbiddenLines(self, pieceAt, dimension, col, row, own, blank):
+        segments = []
+        for difCol, difRow in DIRECTIONS:
+            segment = lineSegment(pieceAt, dimension, col, row, difCol, difRow, own, blank)
+            if segment.count(OWN) >= 3: # A three needs 2 more pieces in the line.
+                segments.append(segment)
+        # Two threes or fours need two such lines; within one line, two fours
+        # share the move and so need 4 more pieces (an overline needs 5).
+        if len(segments) == 0 or (len(segments) == 1 and segments[0].count(OWN) < 5):
+            return None
+
+        overline = False
+        fours = 0
+        threes = 0
+        for segment in segments:
+            series = runLength(segment, REACH)
+            if series == 5:
+                return None # Making five always wins, so nothing is forbidden.
+            if series > 5:
+                overline = True
+            fours += countFours(segment, REACH)
+            if hasOpenThree(segment, REACH):
+                threes += 1
+
+        if overline:
+            return "overline"
+        if fours >= 2:
+            return "double-four"
+        if threes >= 2:
+            return "double-three"
+        return None
+
+
+#> All rule sets by name, in the order the GUI cycles through them.
+RULESETS = {"standard": StandardRules(), "freestyle": FreestyleRules(), "renju": RenjuRules()}
+RULEORDER = ["standard", "freestyle", "renju"]
+
+
+#> Returns the line through col/row along difCol/difRow as a string of
+#  2*REACH+1 letters (OWN, EMPTY, OTHER), with the move placed in the middle.
+#> pieceAt(col, row) returns what is on a spot; own and blank are the values
+#  of the mover's pieces and of empty spots.
+def lineSegment(pieceAt, dimension, col, row, difCol, difRow, own, blank):
+    letters = ""
+    for step in range(-REACH, REACH+1):
+        nextCol = col + step*difCol
+        nextRow = row + step*difRow
+        if step == 0:
+            letters = letters + OWN
+        elif nextCol < 0 or nextCol > dimension-1 or \
+             nextRow < 0 or nextRow > dimension-1:
+            letters = letters + OTHER
+        else:
+            spot = pieceAt(nextCol, nextRow)
+            if spot == own:
+                letters = letters + OWN
+            elif spot == blank:
+                letters = letters + EMPTY
+            else:
+                letters = letters + OTHER
+    return letters
+
+
+#> Returns the length of the run of OWN through index centre.
+def runLength(segment, centre):
+    start = centre
+    while start > 0 and segment[start-1] == OWN:
+        start -= 1
+    end = centre
+    while end < len(segment)-1 and segment[end+1] == OWN:
+        end += 1
+    return end - start + 1
+
+
+#> Returns True if filling the empty spot at indx makes exactly five which
+#  includes the spot at centre.
+def makesFive(segment, indx, centre):
+    filled = segment[:indx] + OWN + segment[indx+1:]
+    return runLength(filled, indx) == 5 and runLength(filled, centre) == 5
+
+
+#> Counts the distinct fours through centre: sets of 4 pieces which one more
+#  piece would turn into exactly five. A straight four (two winning spots for
+#  the same 4 pieces) counts once; "OOO.O.OOO" around the move counts twice.
+def countFours(segment, centre):
+    stoneSets = set()
+    for indx in range(len(segment)):
+        if segment[indx] != EMPTY or not makesFive(segment, indx, centre):
+            continue
+        filled = segment[:indx] + OWN + segment[indx+1:]
+        start = indx
+        while start > 0 and filled[start-1] == OWN:
+            start -= 1
+        stones = []
+        for spot in range(start, start+5):
+            if spot != indx:
+                stones.append(spot)
+        stoneSets.add(tuple(stones))
+    return len(stoneSets)
+
+
+#> Returns True if one more piece can turn the pieces through centre into a
+#  straight four: four in a row, including centre, with both ends winning.
+def hasOpenThree(segment, centre):
+    for indx in range(len(segment)):
+        if segment[indx] != EMPTY:
+            continue
+        filled = segment[:indx] + OWN + segment[indx+1:]
+        if runLength(filled, centre) != 4 or runLength(filled, indx) != 4:
+            continue
+        start = centre
+        while start > 0 and filled[start-1] == OWN:
+            start -= 1
+        left = start - 1
+        right = start + 4
+        if left < 0 or right > len(filled)-1:
+            continue
+        if filled[left] == EMPTY and filled[right] == EMPTY and \
+           makesFive(filled, left, centre) and makesFive(filled, right, centre):
+            return True
+    return False
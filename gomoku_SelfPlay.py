@@ -0,0 +1,213 @@
+###
+### Headless self-play with dataset export.
+###
+### Plays games between two AI levels and streams every position into
+### fixed-shape, memory-mapped .npy shards in an output directory:
+###     positions-NNNNN.npy  (shardSize, maxDimension, maxDimension) int8
+###                          Board cell codes indexed [row in shard, col, row];
+###                          spots outside a smaller board hold -1.
+###     meta-NNNNN.npy       (shardSize, 6) int32, one row per position:
+###                          dimension, side to move, chosen col, chosen row,
+###                          winner (Board code, 0 for a draw), game number.
+###     index.json           The shards and how many rows of each are filled.
+### Only the current shard is mapped, so memory use does not grow with the
+### dataset. Running again on the same directory appends new shards.
+###
+###     Usage: python gomoku_SelfPlay.py --games N --out DIR
+###                [--dimension D] [--black DIFF] [--white DIFF] [--think S]
+###                [--max-dimension M] (boards up to M x M; D may not exceed it)
+###
+
+import argparse
+import json
+import os
+import numpy as np
+from numpy.lib.format import open_memmap
+from gomoku_Board import Board
+from gomoku_Logic import Logic
+
+META_COLUMNS = ["dimension", "toMove", "col", "row", "winner", "game"]
+
+
+#> Plays one game between two AI levels. Yields (board, col, row) before every
+#  move, where board is a Board of the position and col/row the move chosen.
+#> Returns the winner's Board code (0 for a draw) through StopIteration.value.
+def selfPlayGame(dimension, blackDiff, whiteDiff, timeLimit=None):
+    game = Logic(dimension)
+    diffs = {"B": blackDiff, "W": whiteDiff}
+    while True: # Black always moves first, whoever playerSelector() made it.
+        # The side to move is always the "computer" of the Logic instance.
+        piece = game.player
+        if game.comp != piece:
+            game.human, game.comp = game.comp, game.human
+        game.diff = diffs[piece]
+        game.playPatterns = game.patternConverter()
+
+        choice = game.decisionMaker(timeLimit)
+        if choice == []: # No legal move left (e.g. only forbidden spots).
+            return 0
+        col, row = choice
+        yield game.toBoard(), col, row
+        game.play(col, row)
+        if game.checkWin(col, row, piece) != None:
+            return Board.CODES[piece]
+        if game.isDraw():
+            return 0
+
+
+class ShardWriter:
+    #> Writes positions to memory-mapped shards of shardSize rows each.
+    def __init__(self, directory, maxDimension=19, shardSize=65536):
+        self.directory = directory
+        self.maxDimension = maxDimension
+        self.shardSize = shardSize
+        os.makedirs(directory, exist_ok=True)
+
+        self.indexPath = os.path.join(directory, "index.json")
+        self.index = {"maxDimension": maxDimension, "shardSize": shardSize,
+                      "metaColumns": META_COLUMNS, "games": 0, "shards": []}
+        if os.path.exists(self.indexPath):
+            indexFile = open(self.indexPath, "r")
+            self.index = json.load(indexFile)
+            indexFile.close()
+            if self.index["maxDimension"] != maxDimension:
+                raise ValueError("existing dataset uses maxDimension " +
+                                 str(self.index["maxDimension"]))
+            self.shardSize = self.index["shardSize"]
+
+        self.positions = None # Memory maps of the shard being filled.
+        self.meta = None
+        self.rows = 0 # Rows filled in the current shard.
+        self.pending = [] # (meta map, first row, last row) of the game in progress.
+        self.pendingStart = 0 # Row of the current shard where the game started.
+        self.games = self.index["games"] # Game numbers carry on across runs.
+
+
+    #> Creates and maps the next shard.
+    def openShard(self):
+        number = len(self.index["shards"])
+        positionsName = "positions-" + str(number).zfill(5) + ".npy"
+        metaName = "meta-" + str(number).zfill(5) + ".npy"
+        self.positions = open_memmap(os.path.join(self.directory, positionsName), mode="w+",
+                                     dtype=np.int8,
+                                     shape=(self.shardSize, self.maxDimension, self.maxDimension))
+        self.meta = open_memmap(os.path.join(self.directory, metaName), mode="w+",
+                                dtype=np.int32, shape=(self.shardSize, len(META_COLUMNS)))
+        self.index["shards"].append({"positions": positionsName, "meta": metaName, "rows": 0})
+        self.rows = 0
+
+
+    #> Flushes the current shard and records how many rows it holds.
+    def closeShard(self):
+        if self.positions is None:
+            return
+        self.positions.flush()
+        self.meta.flush()
+        self.index["shards"][-1]["rows"] = self.rows
+        self.index["games"] = self.games
+        self.writeIndex()
+        self.positions = None
+        self.meta = None
+
+
+    def writeIndex(self):
+        indexFile = open(self.indexPath + ".tmp", "w")
+        json.dump(self.index, indexFile, indent=1)
+        indexFile.close()
+        os.replace(self.indexPath + ".tmp", self.indexPath)
+
+
+    #> Appends one position and the move chosen in it.
+    def addPosition(self, board, col, row):
+        if self.positions is None or self.rows == self.shardSize:
+            if self.positions is not None:
+                # The game carries on into the next shard; its result is
+                # written to this one when it ends.
+                self.pending.append((self.meta, self.pendingStart, self.rows))
+                self.closeShard()
+            self.openShard()
+            self.pendingStart = 0
+
+        dimension = board.dimension
+        cells = np.frombuffer(bytes(board.cells), dtype=np.int8).reshape(dimension, dimension)
+        self.positions[self.rows] = -1
+        self.positions[self.rows, :dimension, :dimension] = cells
+        self.meta[self.rows] = [dimension, board.toMove, col, row, 0, self.games]
+        self.rows += 1
+
+
+    #> Marks the end of a game and writes its result into all of its rows.
+    def endGame(self, winner):
+        self.pending.append((self.meta, self.pendingStart, self.rows))
+        for meta, first, last in self.pending:
+            meta[first:last, 4] = winner
+            if meta is not self.meta:
+                meta.flush()
+        self.pending = []
+        self.pendingStart = self.rows
+        self.games += 1
+
+
+    def close(self):
+        self.closeShard()
+
+
+#> Plays games and streams them into a dataset directory.
+#> Returns the number of positions written.
+def generate(directory, games, dimension, blackDiff, whiteDiff, timeLimit,
+             maxDimension=19, shardSize=65536):
+    if dimension > maxDimension:
+        raise ValueError("dimension " + str(dimension) + " is larger than maxDimension " +
+                         str(maxDimension))
+    writer = ShardWriter(directory, maxDimension, shardSize)
+    positions = 0
+    for gameNum in range(games):
+        play = selfPlayGame(dimension, blackDiff, whiteDiff, timeLimit)
+        try:
+            while True:
+                board, col, row = next(play)
+                writer.addPosition(board, col, row)
+                positions += 1
+        except StopIteration as result:
+            writer.endGame(result.value)
+    writer.close()
+    return positions
+
+
+#> Yields (positions, meta) array pairs for every shard of a dataset, mapped
+#  read-only and trimmed to the filled rows. Nothing is loaded into RAM until
+#  it is indexed.
+def loadDataset(directory):
+    indexFile = open(os.path.join(directory, "index.json"), "r")
+    index = json.load(indexFile)
+    indexFile.close()
+    for shard in index["shards"]:
+        rows = shard["rows"]
+        positions = np.load(os.path.join(directory, shard["positions"]), mmap_mode="r")
+        meta = np.load(os.path.join(directory, shard["meta"]), mmap_mode="r")
+        yield positions[:rows], meta[:rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gomoku self-play dataset export")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--out", default="selfplay")
+    parser.add_argument("--dimension", type=int, default=15)
+    parser.add_argument("--black", type=int, default=3, help="difficulty of black")
+    parser.add_argument("--white", type=int, default=3, help="difficulty of white")
+    parser.add_argument("--think", type=float, default=Logic.SELFPLAYTIMELIMIT)
+    parser.add_argument("--shard-size", type=int, default=65536)
+    parser.add_argument("--max-dimension", type=int, default=19,
+                        help="side of the stored board arrays (fixed per dataset)")
+    args = parser.parse_args(argv)
+    if args.dimension > args.max_dimension:
+        parser.error("--dimension may not be larger than --max-dimension")
+
+    positions = generate(args.out, args.games, args.dimension, args.black,
+                         args.white, args.think, args.max_dimension, args.shard_size)
+    print("Wrote " + str(positions) + " positions from " + str(args.games) +
+          " games to " + args.out)
+
+
+if __name__ == "__main__":
+    main()
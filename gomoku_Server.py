@@ -0,0 +1,480 @@
+###
+### Multi-game Gomoku server and load generator.
+###
+### Hosts many headless Logic games in one process over a plain TCP line
+### protocol. The event loop only parses commands; every AI reply runs on a
+### thread pool so the loop never blocks on a search.
+### Idle games are kept as a StoredGame (a compact Board plus a few settings,
+### about 0.6 KB on 15x15) instead of a Logic (about 35 KB). Only the
+### --hot-games most recently used games stay as Logic instances, so games
+### being played are not rebuilt on every move.
+###
+###     Protocol (one command per line, one reply per line):
+###         NEW [dimension] [diff]  -> OK <id> <dimension> <human> <col> <row>
+###                                    (col/row is the AI's opening move, or -1 -1;
+###                                    dimension is 5 to --max-dimension)
+###         MOVE <id> <col> <row>   -> OK <col> <row> <status>
+###                                    status: PLAY, WIN, LOSS or DRAW. When the
+###                                    human's move ends the game, col/row is -1 -1.
+###         SAVE <id>               -> OK SAVED
+###         LOAD <id>               -> OK <id> <dimension> <human> -1 -1
+###                                    (refused while game <id> is still open)
+###         QUIT <id>               -> OK BYE
+###         STATS                   -> OK <games> <moves>
+###         Errors are answered with: ERR <message>
+###
+###     Saves use the same format as gomoku_Save.gmk (Logic.serializeGame()).
+###     NEW never hands out an id which is open or has a save in --save-dir,
+###     so ids stay unique across restarts and saves never replace each other.
+###     Games opened by NEW or LOAD are closed when the connection which
+###     opened them ends, QUIT or not; at most --max-games are open at once.
+###
+###     Usage (serve is the default mode):
+###         python gomoku_Server.py serve [--port P] [--think S] [--save-dir D]
+###                                       [--max-dimension N] [--max-games N]
+###                                       [--hot-games N]
+###         python gomoku_Server.py load [--port P] [--clients N] [--games G] [--spawn]
+###
+
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from gomoku_Autosave import writeAtomic
+from gomoku_Board import Board
+from gomoku_Logic import Logic
+
+
+#> A game between requests: the position as a Board and the settings Logic
+#  needs to carry on from it. Never changed once made; every request which
+#  changes the game stores a new one.
+class StoredGame:
+    __slots__ = ("board", "human", "diff", "rules", "move", "winState")
+
+    def __init__(self, game):
+        self.board = game.toBoard()
+        self.human = game.human
+        self.diff = game.diff
+        self.rules = game.rules
+        self.move = game.move
+        self.winState = game.winState
+
+
+    #> Returns a new Logic instance set up to carry on the game. The tree
+    #  search (diff 4) starts a new tree, as trees are not stored.
+    def toLogic(self):
+        game = Logic(self.board.dimension)
+        game.human = self.human
+        game.comp = Board.PIECES[3 - Board.CODES[self.human]]
+        game.diff = self.diff
+        game.rules = self.rules
+        game.move = self.move
+        game.winState = self.winState
+        game.loadBoard(self.board)
+        game.playPatterns = game.patternConverter()
+        return game
+
+
+class GameServer:
+    #> think is the AI's time budget per move, in seconds.
+    #> saveDir is where SAVE / LOAD keep their .gmk files.
+    #> maxDimension is the largest board a client may ask for.
+    #> maxGames is the most games open at once, over all clients.
+    #> hotGames is how many recently used games are kept as Logic instances.
+    def __init__(self, think=0.02, saveDir="saves", workers=None, maxDimension=19,
+                 maxGames=10000, hotGames=256):
+        self.think = think
+        self.saveDir = saveDir
+        self.maxDimension = maxDimension
+        self.maxGames = maxGames
+        self.hotGames = hotGames
+        self.games = {} # Game id -> StoredGame; out of date while the game is hot.
+        self.hot = OrderedDict() # Game id -> Logic, least recently used first.
+        self.locks = {} # Game id -> asyncio.Lock, so one game never runs twice.
+        self.ids = itertools.count(1)
+        self.moves = 0
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+
+    #> Starts listening for clients. Returns the asyncio server object.
+    async def start(self, host="127.0.0.1", port=8231):
+        return await asyncio.start_server(self.handleClient, host, port)
+
+
+    #> Reads commands from one client until it disconnects, then closes the
+    #  games that client opened.
+    async def handleClient(self, reader, writer):
+        opened = {} # Id -> lock, for the games opened on this connection.
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                reply = await self.handleCommand(line.decode().split(), opened)
+                writer.write((reply + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for gameId, lock in opened.items():
+                self.closeGame(gameId, lock)
+            writer.close()
+
+
+    #> Runs one parsed command and returns the reply line.
+    #> opened maps the ids of the games the client's connection has open to
+    #  their locks; NEW, LOAD and QUIT keep it up to date.
+    async def handleCommand(self, words, opened=None):
+        if opened is None:
+            opened = {}
+        if len(words) == 0:
+            return "ERR empty command"
+        command = words[0].upper()
+        try:
+            if command in ["NEW", "LOAD"] and len(self.games) >= self.maxGames:
+                return "ERR server is full"
+            if command == "NEW":
+                reply = await self.newGame(words[1:])
+            elif command == "MOVE":
+                return await self.humanMove(words[1], int(words[2]), int(words[3]))
+            elif command == "SAVE":
+                return await self.saveGame(words[1])
+            elif command == "LOAD":
+                reply = await self.loadGame(words[1])
+            elif command == "QUIT":
+                self.closeGame(words[1])
+                opened.pop(words[1], None)
+                return "OK BYE"
+            elif command == "STATS":
+                return "OK " + str(len(self.games)) + " " + str(self.moves)
+            else:
+                return "ERR unknown command " + command
+        except (IndexError, ValueError):
+            return "ERR bad arguments for " + command
+        except KeyError:
+            return "ERR no such game"
+        if reply.startswith("OK "): # NEW and LOAD answer "OK <id> ...".
+            gameId = reply.split()[1]
+            if gameId in self.locks: # Unless another client already quit it.
+                opened[gameId] = self.locks[gameId]
+        return reply
+
+
+    #> Forgets the game with this id, if it is open. With lock, only does so
+    #  if the id still belongs to the game with that lock (another client may
+    #  have quit it and the id been given out again).
+    def closeGame(self, gameId, lock=None):
+        if gameId in self.locks and (lock is None or self.locks[gameId] is lock):
+            del self.games[gameId]
+            del self.locks[gameId]
+            self.hot.pop(gameId, None)
+
+
+    #> Keeps game as the hot (Logic) form of gameId, unless it was closed
+    #  meanwhile, then stores the least recently used hot games beyond
+    #  hotGames as StoredGames. Games in the middle of a request are skipped.
+    def keepGame(self, gameId, game):
+        if gameId not in self.games:
+            return
+        self.hot[gameId] = game
+        self.hot.move_to_end(gameId)
+        for oldId in list(self.hot):
+            if len(self.hot) <= self.hotGames:
+                break
+            if not self.locks[oldId].locked():
+                self.games[oldId] = StoredGame(self.hot.pop(oldId))
+
+
+    #> Returns the Logic instance for gameId: the hot one, or one rebuilt from
+    #  its StoredGame on the executor. Called with the game's lock held.
+    async def openGame(self, gameId):
+        if gameId in self.hot:
+            return self.hot[gameId]
+        stored = self.games[gameId]
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, stored.toLogic)
+
+
+    #> Creates a game. If the computer plays black, its first move is made
+    #  before replying.
+    async def newGame(self, args):
+        dimension = None
+        if len(args) > 0:
+            dimension = int(args[0])
+            if dimension < 5 or dimension > self.maxDimension:
+                raise ValueError(dimension)
+        game = Logic(dimension)
+        if len(args) > 1:
+            game.diff = int(args[1])
+            game.playPatterns = game.patternConverter()
+
+        gameId = self.newId()
+        self.games[gameId] = None # Reserves the id; keepGame() stores the game.
+        self.locks[gameId] = asyncio.Lock()
+
+        reply = [-1, -1, "PLAY"]
+        async with self.locks[gameId]:
+            if game.player == game.comp:
+                reply = await self.runAI(game)
+            self.keepGame(gameId, game)
+        return "OK " + gameId + " " + str(game.dimension) + " " + game.human +\
+               " " + str(reply[0]) + " " + str(reply[1])
+
+
+    #> Returns the next id which is neither open nor saved in saveDir, as
+    #  the counter starts again at 1 whenever the server restarts.
+    def newId(self):
+        while True:
+            gameId = str(next(self.ids))
+            if gameId not in self.games and \
+               not os.path.exists(os.path.join(self.saveDir, gameId + ".gmk")):
+                return gameId
+
+
+    #> Plays the human's move, then the AI's reply on the thread pool.
+    async def humanMove(self, gameId, col, row):
+        async with self.locks[gameId]:
+            game = await self.openGame(gameId)
+            if game.winState:
+                return "ERR game is over"
+            if game.player != game.human or not game.isValidInput(col, row):
+                return "ERR invalid move"
+
+            game.play(col, row)
+            self.moves += 1
+            game.move += 1
+            if game.checkWin(col, row, game.human) != None:
+                game.winState = True
+                reply = [-1, -1, "WIN"]
+            elif game.isDraw():
+                game.winState = True
+                reply = [-1, -1, "DRAW"]
+            else:
+                reply = await self.runAI(game)
+            self.keepGame(gameId, game)
+        return "OK " + str(reply[0]) + " " + str(reply[1]) + " " + reply[2]
+
+
+    #> Runs the AI's move for game on the executor. Returns [col, row, status].
+    async def runAI(self, game):
+        loop = asyncio.get_running_loop()
+        reply = await loop.run_in_executor(self.executor, self.aiMove, game)
+        if reply[0] != -1:
+            self.moves += 1
+        return reply
+
+
+    #> Chooses and plays the computer's move. Runs on a worker thread.
+    def aiMove(self, game):
+        if game.diff == 0: # AI disabled: the human just moves again.
+            game.player = game.human
+            return [-1, -1, "PLAY"]
+
+        choice = game.decisionMaker(self.think)
+        if choice == []: # Nowhere left to play.
+            game.winState = True
+            return [-1, -1, "DRAW"]
+        col, row = choice
+        game.play(col, row)
+        if game.checkWin(col, row, game.comp) != None:
+            game.winState = True
+            return [col, row, "LOSS"]
+        if game.isDraw():
+            game.winState = True
+            return [col, row, "DRAW"]
+        return [col, row, "PLAY"]
+
+
+    #> Writes the game to <saveDir>/<id>.gmk on the executor.
+    async def saveGame(self, gameId):
+        async with self.locks[gameId]:
+            game = await self.openGame(gameId)
+        path = os.path.join(self.saveDir, gameId + ".gmk")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, writeFile, path, game.serializeGame())
+        return "OK SAVED"
+
+
+    #> Reads <saveDir>/<id>.gmk back into memory under the same id.
+    #> Refuses while a game with that id is open, rather than replace it.
+    async def loadGame(self, gameId):
+        gameId = os.path.basename(gameId) # Keeps the file inside saveDir.
+        if gameId in self.games:
+            return "ERR game " + gameId + " is already open"
+        path = os.path.join(self.saveDir, gameId + ".gmk")
+        loop = asyncio.get_running_loop()
+        try:
+            text = await loop.run_in_executor(self.executor, readFile, path)
+        except IOError:
+            return "ERR no save for " + gameId
+        game = Logic(5)
+        game.restoreGame(text)
+        if game.dimension > self.maxDimension:
+            return "ERR save is larger than " + str(self.maxDimension) + "x" + str(self.maxDimension)
+        if gameId in self.games: # Opened by another client while the file was read.
+            return "ERR game " + gameId + " is already open"
+        self.games[gameId] = None
+        self.locks[gameId] = asyncio.Lock()
+        self.keepGame(gameId, game)
+        return "OK " + gameId + " " + str(game.dimension) + " " + game.human + " -1 -1"
+
+
+#> Saves are replaced atomically, so a crash never leaves half a save.
+def writeFile(path, text):
+    writeAtomic(path, text)
+
+
+def readFile(path):
+    loaded = open(path, "r")
+    text = loaded.read()
+    loaded.close()
+    return text
+
+
+#> One simulated player: starts games on its own connection and plays random
+#  moves next to the existing pieces until each game ends.
+#> Appends the latency of every MOVE request (in seconds) to latencies.
+async def loadClient(host, port, games, dimension, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def request(line):
+        writer.write((line + "\n").encode())
+        await writer.drain()
+        return (await reader.readline()).decode().split()
+
+    for gameNum in range(games):
+        reply = await request("NEW " + str(dimension) + " 3")
+        gameId = reply[1]
+        dimension = int(reply[2])
+        taken = set()
+        if reply[4] != "-1":
+            taken.add((int(reply[4]), int(reply[5])))
+
+        status = "PLAY"
+        while status == "PLAY" and len(taken) < dimension*dimension:
+            col, row = pickLoadMove(taken, dimension)
+            start = time.perf_counter()
+            reply = await request("MOVE " + gameId + " " + str(col) + " " + str(row))
+            latencies.append(time.perf_counter() - start)
+            if reply[0] != "OK":
+                break
+            taken.add((col, row))
+            taken.add((int(reply[1]), int(reply[2])))
+            status = reply[3]
+        await request("QUIT " + gameId)
+
+    writer.close()
+
+
+#> Picks a random empty spot next to an existing piece (or anywhere if none).
+def pickLoadMove(taken, dimension):
+    for attempt in range(20):
+        if len(taken) == 0:
+            break
+        col, row = random.choice(list(taken))
+        col += random.randrange(-1, 2)
+        row += random.randrange(-1, 2)
+        if 0 <= col < dimension and 0 <= row < dimension and (col, row) not in taken:
+            return col, row
+    while True:
+        col = random.randrange(dimension)
+        row = random.randrange(dimension)
+        if (col, row) not in taken:
+            return col, row
+
+
+#> Runs clients simulated players at once and reports throughput and latency.
+#> If spawn is True, a server is started in this process first.
+#> Returns [moves per second, p99 latency in seconds].
+async def runLoad(host, port, clients, games, dimension, spawn=False, think=0.02):
+    server = None
+    if spawn:
+        server = await GameServer(think).start(host, port)
+        port = server.sockets[0].getsockname()[1]
+
+    latencies = []
+    start = time.perf_counter()
+    tasks = []
+    for client in range(clients):
+        tasks.append(loadClient(host, port, games, dimension, latencies))
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - start
+
+    if server is not None:
+        server.close()
+        await server.wait_closed()
+
+    latencies.sort()
+    p99 = 0.0
+    if len(latencies) != 0:
+        p99 = latencies[min(len(latencies)-1, int(len(latencies) * 0.99))]
+    rate = len(latencies) / max(elapsed, 1e-9)
+    print(str(len(latencies)) + " moves in " + str(round(elapsed, 2)) + " s: " +
+          str(int(rate)) + " moves/s, p99 latency " + str(round(p99 * 1000, 1)) + " ms")
+    return [rate, p99]
+
+
+async def serve(host, port, think, saveDir, maxDimension=19, maxGames=10000, hotGames=256):
+    server = await GameServer(think, saveDir, maxDimension=maxDimension,
+                              maxGames=maxGames, hotGames=hotGames).start(host, port)
+    print("Serving Gomoku on " + host + ":" + str(port))
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    if len(argv) == 0 or argv[0] not in ["serve", "load", "-h", "--help"]:
+        argv = ["serve"] + list(argv) # Lets "serve" be left out.
+    parser = argparse.ArgumentParser(description="Multi-game Gomoku server")
+    sub = parser.add_subparsers(dest="mode", required=True)
+
+    serveParser = sub.add_parser("serve", help="host games over TCP")
+    serveParser.add_argument("--host", default="127.0.0.1")
+    serveParser.add_argument("--port", type=int, default=8231)
+    serveParser.add_argument("--think", type=float, default=0.02)
+    serveParser.add_argument("--save-dir", default="saves")
+    serveParser.add_argument("--max-dimension", type=int, default=19,
+                             help="largest board NEW may ask for")
+    serveParser.add_argument("--max-games", type=int, default=10000,
+                             help="most games open at once")
+    serveParser.add_argument("--hot-games", type=int, default=256,
+                             help="recently used games kept ready to play (the rest are compacted)")
+    serveParser.add_argument("--ranking", default="gomoku_Ranking.json",
+                             help="tuned pattern ranking, used if the file exists")
+
+    loadParser = sub.add_parser("load", help="run the load generator")
+    loadParser.add_argument("--host", default="127.0.0.1")
+    loadParser.add_argument("--port", type=int, default=8231)
+    loadParser.add_argument("--clients", type=int, default=50)
+    loadParser.add_argument("--games", type=int, default=2)
+    loadParser.add_argument("--dimension", type=int, default=15)
+    loadParser.add_argument("--think", type=float, default=0.02)
+    loadParser.add_argument("--spawn", action="store_true",
+                            help="start a server in this process (port 0 = any)")
+    args = parser.parse_args(argv)
+
+    if args.mode == "serve":
+        if os.path.exists(args.ranking):
+            try:
+                Logic.loadPatternRanking(args.ranking)
+            except ValueError as error:
+                parser.error(args.ranking + ": " + str(error))
+        asyncio.run(serve(args.host, args.port, args.think, args.save_dir, args.max_dimension,
+                          args.max_games, args.hot_games))
+    else:
+        port = args.port
+        if args.spawn and port == 8231:
+            port = 0
+        asyncio.run(runLoad(args.host, port, args.clients, args.games,
+                            args.dimension, args.spawn, args.think))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+###
+### Sparse board mode for large (100x100 and up) or unbounded boards.
+###
+### Only the occupied spots are stored, in a dict keyed by (col, row), along
+### with a bounding box of the pieces. Win checks, the candidate set and the
+### AI only look at the spots around existing pieces, so their cost grows with
+### the number of pieces rather than with the board area.
+### The base-3 code of every 4- and 5-spot window holding a piece is kept up
+### to date as pieces are played and undone (updateCode()), so the AI reads
+### each window's code instead of rebuilding it.
+###
+### The game can be played in the GUI with "gomoku_Control.py play --sparse";
+### the view then follows the pieces (SparseBoard.viewWindow()).
+###
+
+import random
+import time
+from gomoku_Logic import Logic
+from gomoku_Patterns import blankIndex, compilePatterns, updateCode
+
+DIRECTIONS = [(1, 0), (0, 1), (1, 1), (1, -1)]
+
+
+class SparseBoard:
+    __slots__ = ("limit", "cells", "history", "nearCount", "candidates", "windowCodes",
+                 "minCol", "maxCol", "minRow", "maxRow")
+
+    BLANK = "X"
+    WINDOWLENGTHS = (4, 5) # Lengths of the windows kept in windowCodes (all pattern lengths).
+
+    #> limit is the side length of a square board (spots 0..limit-1), or None
+    #  for an unbounded plane.
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.cells = {} # (col, row) -> "B" or "W"; blank spots are not stored.
+        self.history = [] # (col, row, piece, previous bounding box)
+        self.nearCount = {} # (col, row) -> number of pieces in the 8 spots around it.
+        self.candidates = set() # Empty spots next to at least one piece.
+        # (startCol, startRow, difCol, difRow, length) -> base-3 code of that
+        # window, for every window holding at least one piece.
+        self.windowCodes = {}
+        self.minCol = self.maxCol = self.minRow = self.maxRow = None
+
+
+    #> Returns True if col/row is on the board.
+    def inBounds(self, col, row):
+        if self.limit is None:
+            return True
+        return 0 <= col < self.limit and 0 <= row < self.limit
+
+
+    #> Returns the piece at col/row, or BLANK.
+    def get(self, col, row):
+        return self.cells.get((col, row), self.BLANK)
+
+
+    #> Same contract as Logic.isValidInput(): on the board and empty.
+    def isValidInput(self, col, row):
+        return self.inBounds(col, row) and (col, row) not in self.cells
+
+
+    #> Returns the number of pieces on the board.
+    def stoneCount(self):
+        return len(self.cells)
+
+
+    #> Returns True if a bounded board has no empty spots left.
+    def isFull(self):
+        return self.limit is not None and len(self.cells) == self.limit * self.limit
+
+
+    #> Places piece at col/row and updates the bounding box and candidate set.
+    def play(self, col, row, piece):
+        self.history.append((col, row, piece,
+                             (self.minCol, self.maxCol, self.minRow, self.maxRow)))
+        self.cells[(col, row)] = piece
+        self.candidates.discard((col, row))
+        if self.minCol is None:
+            self.minCol = self.maxCol = col
+            self.minRow = self.maxRow = row
+        else:
+            self.minCol = min(self.minCol, col)
+            self.maxCol = max(self.maxCol, col)
+            self.minRow = min(self.minRow, row)
+            self.maxRow = max(self.maxRow, row)
+        self.updateNear(col, row, 1)
+        self.updateWindows(col, row, self.BLANK, piece)
+
+
+    #> Takes back the last play(). Returns its col/row.
+    def undo(self):
+        col, row, piece, box = self.history.pop()
+        del self.cells[(col, row)]
+        self.minCol, self.maxCol, self.minRow, self.maxRow = box
+        self.updateNear(col, row, -1)
+        self.updateWindows(col, row, piece, self.BLANK)
+        if self.nearCount.get((col, row), 0) > 0:
+            self.candidates.add((col, row))
+        return col, row
+
+
+    #> Adds change to the neighbour counts around col/row, keeping the
+    #  candidate set in step.
+    def updateNear(self, col, row, change):
+        for nearCol in range(col-1, col+2):
+            for nearRow in range(row-1, row+2):
+                if (nearCol == col and nearRow == row) or not self.inBounds(nearCol, nearRow):
+                    continue
+                spot = (nearCol, nearRow)
+                count = self.nearCount.get(spot, 0) + change
+                if count == 0:
+                    del self.nearCount[spot]
+                    self.candidates.discard(spot)
+                else:
+                    self.nearCount[spot] = count
+                    if spot not in self.cells:
+                        self.candidates.add(spot)
+
+
+    #> Updates the code of every window which covers col/row, where the spot
+    #  changed from oldLetter to newLetter. Windows left empty are dropped.
+    def updateWindows(self, col, row, oldLetter, newLetter):
+        for difCol, difRow in DIRECTIONS:
+            for length in self.WINDOWLENGTHS:
+                for position in range(length):
+                    window = (col - position*difCol, row - position*difRow, difCol, difRow, length)
+                    code = updateCode(self.windowCodes.get(window, 0), length, position,
+                                      oldLetter, newLetter)
+                    if code == 0:
+                        del self.windowCodes[window]
+                    else:
+                        self.windowCodes[window] = code
+
+
+    #> Counts the run of piece through col/row along difCol/difRow, like
+    #  Logic.checkLine(). Returns [series, first end, last end].
+    def runThrough(self, col, row, difCol, difRow, piece):
+        ends = []
+        series = 1
+        for dir in [-1, 1]:
+            step = 1
+            while self.cells.get((col + dir*step*difCol, row + dir*step*difRow)) == piece:
+                step += 1
+            series += step - 1
+            ends.append((col + dir*(step-1)*difCol, row + dir*(step-1)*difRow))
+        return [series, ends[1], ends[0]]
+
+
+    #> Returns [start, end] of a series of exactly 5 through col/row, or None.
+    def checkWin(self, col, row, piece):
+        for difCol, difRow in DIRECTIONS:
+            series, start, end = self.runThrough(col, row, difCol, difRow, piece)
+            if series == 5:
+                return [start, end]
+        return None
+
+
+    #> Returns the full length of the diagonal through col/row along
+    #  difCol/difRow on a bounded board, or None for rows, columns and
+    #  unbounded boards (where no line is too short to matter).
+    def diagonalLength(self, col, row, difCol, difRow):
+        if self.limit is None or difCol == 0 or difRow == 0:
+            return None
+        if difCol == difRow:
+            return self.limit - abs(col - row)
+        total = col + row
+        return min(total, 2*(self.limit-1) - total) + 1
+
+
+    #> Returns (originCol, originRow, size) of a square view which holds every
+    #  piece with margin spots to spare, and is at least minSize spots wide.
+    #> Used to scroll / zoom the display to the active region.
+    def viewWindow(self, minSize=15, margin=2):
+        if self.minCol is None:
+            centre = 0
+            if self.limit is not None:
+                centre = self.limit // 2
+            return centre - minSize//2, centre - minSize//2, minSize
+
+        size = max(minSize, self.maxCol - self.minCol + 1 + 2*margin,
+                   self.maxRow - self.minRow + 1 + 2*margin)
+        originCol = (self.minCol + self.maxCol) // 2 - size//2
+        originRow = (self.minRow + self.maxRow) // 2 - size//2
+        if self.limit is not None:
+            size = min(size, self.limit)
+            originCol = max(0, min(originCol, self.limit - size))
+            originRow = max(0, min(originRow, self.limit - size))
+        return originCol, originRow, size
+
+
+#> A headless game on a SparseBoard with the same pattern AI as Logic.
+class SparseGame:
+    BLANK = Logic.BLANK
+    GUITIMELIMIT = Logic.GUITIMELIMIT
+    NOPATS = Logic.NOPATS
+    EASYPATS = Logic.EASYPATS
+    HARDPATS = Logic.HARDPATS
+    patternConverter = Logic.patternConverter # Works on human / comp / diff below.
+    playerSelector = Logic.playerSelector
+
+    def __init__(self, limit=None, diff=3):
+        self.board = SparseBoard(limit)
+        self.diff = diff
+        self.human = None
+        self.comp = None
+        self.player = None
+        self.winState = False
+        self.evalCount = 0
+        self.playerSelector()
+        self.playPatterns = self.patternConverter()
+
+
+    #> Same contract as Logic.isValidInput().
+    def isValidInput(self, col, row):
+        return self.board.isValidInput(col, row)
+
+
+    #> Places the current player's piece and passes the turn.
+    #> Returns [start, end] of the winning series if the move won, else None.
+    def play(self, col, row):
+        piece = self.player
+        self.board.play(col, row, piece)
+        if piece == self.human:
+            self.player = self.comp
+        else:
+            self.player = self.human
+        winResult = self.board.checkWin(col, row, piece)
+        if winResult is not None or self.board.isFull():
+            self.winState = True
+        return winResult
+
+
+    #> Chooses the computer's move with the ranked patterns, looking only at
+    #  windows which hold at least one piece (board.windowCodes). Ranks as
+    #  Logic.lookUpPatterns():
+    #  lowest pattern index, then lowest col/row; random on "easy".
+    #> Like Logic.diagLines(), diagonals shorter than 5 spots are skipped on a
+    #  bounded board, so on the same position both choose the same move.
+    #> Falls back to a random spot next to a piece. Returns [col, row].
+    def decisionMaker(self, timeLimit=None):
+        deadline = None
+        if timeLimit is not None:
+            deadline = time.perf_counter() + timeLimit
+        self.evalCount = 0
+        board = self.board
+        tables = compilePatterns(self.playPatterns)
+
+        choices = []
+        for window, code in board.windowCodes.items():
+            if window[4] not in tables.tables:
+                continue
+            if deadline is not None and self.evalCount % 64 == 0 and \
+               time.perf_counter() >= deadline:
+                break
+            self.evalCount += 1
+            self.matchWindow(tables, window, code, choices)
+
+        if len(choices) != 0:
+            choices.sort()
+            if self.diff == 1:
+                return choices[random.randrange(len(choices))][1]
+            return choices[0][1]
+        return self.fallbackMove()
+
+
+    #> Scores one window, whose code is kept by the board, with the lookup
+    #  tables and appends [pattern index, [col, row]] to choices for every
+    #  pattern it matches.
+    def matchWindow(self, tables, window, code, choices):
+        startCol, startRow, difCol, difRow, length = window
+        endCol = startCol + (length-1)*difCol
+        endRow = startRow + (length-1)*difRow
+        if not (self.board.inBounds(startCol, startRow) and self.board.inBounds(endCol, endRow)):
+            return
+        diagonal = self.board.diagonalLength(startCol, startRow, difCol, difRow)
+        if diagonal is not None and diagonal < 5: # Too short to ever hold five.
+            return
+
+        for patternIndx in tables.lookUp(length, code):
+            offset = tables.offsets[patternIndx]
+            if offset is None:
+                offset = blankIndex(code, length)
+            choices.append([patternIndx, [startCol + offset*difCol, startRow + offset*difRow]])
+
+
+    #> Plays in the centre of an empty board, else next to a piece.
+    def fallbackMove(self):
+        board = self.board
+        if board.stoneCount() == 0:
+            centre = 0
+            if board.limit is not None:
+                centre = board.limit // 2
+            return [centre, centre]
+        if len(board.candidates) != 0:
+            return list(random.choice(list(board.candidates)))
+        return []
@@ -0,0 +1,161 @@
+###
+### Tunes the ranking of Logic.HARDPATS from self-play.
+###
+### Each pattern gets a numeric weight; higher weights rank first, which is the
+### order lookUpPatterns() uses (ties keep the original order). The weights are
+### tuned with SPSA: every iteration perturbs all weights at once by +/-c,
+### plays a batch of games between the two perturbed rankings and steps the
+### weights towards the side which won more.
+###
+### Games are played with the batched NumPy engine (gomoku_Batch.py), many at
+### a time, and the batches are spread over all cores with multiprocessing.
+### The result is written as JSON which Logic.loadPatternRanking() reads.
+###
+###     Usage: python gomoku_Tune.py [--iterations N] [--games G] [--dimension D]
+###                                  [--out gomoku_Ranking.json] [--workers W]
+###
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import numpy as np
+from gomoku_Batch import batchDecisions
+from gomoku_Logic import Logic
+
+
+#> Returns the patterns ordered by weight, best first (stable for ties).
+def rankPatterns(patterns, weights):
+    order = sorted(range(len(patterns)), key=lambda indx: -weights[indx])
+    return [patterns[indx] for indx in order]
+
+
+#> Returns True if the piece at col/row is part of a series of exactly 5.
+def isWin(board, col, row, code):
+    dimension = board.shape[0]
+    for difCol, difRow in [(1, 0), (0, 1), (1, 1), (1, -1)]:
+        series = 1
+        for dir in [-1, 1]:
+            nextCol = col + dir*difCol
+            nextRow = row + dir*difRow
+            while 0 <= nextCol < dimension and 0 <= nextRow < dimension and \
+                  board[nextCol, nextRow] == code:
+                series += 1
+                nextCol += dir*difCol
+                nextRow += dir*difRow
+        if series == 5:
+            return True
+    return False
+
+
+#> Plays count games at once between two rankings. Games in the first half
+#  give ranking A black; the second half give it white. Each game opens with
+#  a few random moves near the centre so the games differ.
+#> Returns A's score: +1 per win, -1 per loss, 0 per draw.
+def playMatch(args):
+    rankingA, rankingB, count, dimension, seed = args
+    rng = np.random.default_rng(seed)
+    boards = np.zeros((count, dimension, dimension), dtype=np.int8)
+    codeA = np.where(np.arange(count) < count//2, 1, 2) # Board code played by A.
+    results = np.zeros(count, dtype=np.int64) # Winner code; 0 while unfinished.
+    active = np.ones(count, dtype=bool)
+
+    centre = dimension // 2
+    for ply in range(dimension * dimension):
+        toMove = 1 + ply % 2
+        moves = np.zeros((count, 2), dtype=np.int64)
+        if ply < 4:
+            for game in range(count):
+                while True:
+                    col, row = rng.integers(centre-2, centre+3, size=2)
+                    if boards[game, col, row] == 0:
+                        moves[game] = [col, row]
+                        break
+        else:
+            comps = np.full(count, toMove, dtype=np.int8)
+            useA = codeA == toMove
+            for ranking, mask in [(rankingA, useA), (rankingB, ~useA)]:
+                mask = mask & active
+                if mask.any():
+                    moves[mask] = batchDecisions(boards[mask], comps[mask], 3, rng, ranking)
+
+        for game in np.nonzero(active)[0]:
+            col, row = moves[game]
+            if col < 0:
+                active[game] = False # Full board: a draw.
+                continue
+            boards[game, col, row] = toMove
+            if isWin(boards[game], col, row, toMove):
+                results[game] = toMove
+                active[game] = False
+        if not active.any():
+            break
+
+    score = np.where(results == codeA, 1, np.where(results == 0, 0, -1))
+    return int(score.sum())
+
+
+#> Plays games between two rankings over the worker pool. Returns A's mean score.
+def compare(pool, rankingA, rankingB, games, dimension, workers, seed):
+    perWorker = max(2, -(-games // workers))
+    perWorker += perWorker % 2 # Even, so A plays as many games with black as with white.
+    jobs = []
+    for worker in range(workers):
+        jobs.append((rankingA, rankingB, perWorker, dimension, seed + worker))
+    scores = pool.map(playMatch, jobs)
+    return sum(scores) / (perWorker * workers)
+
+
+#> Runs SPSA on the pattern weights and returns the tuned weights.
+def tune(iterations, games, dimension, workers, seed=231, a=0.6, c=1.0):
+    patterns = list(Logic.HARDPATS)
+    weights = np.arange(len(patterns), 0, -1, dtype=float) # The hand ranking.
+    rng = np.random.default_rng(seed)
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        for iteration in range(1, iterations+1):
+            start = time.perf_counter()
+            stepA = a / iteration ** 0.602 # Standard SPSA gain sequences.
+            stepC = c / iteration ** 0.101
+            delta = rng.choice([-1.0, 1.0], size=len(patterns))
+            plus = rankPatterns(patterns, weights + stepC*delta)
+            minus = rankPatterns(patterns, weights - stepC*delta)
+            score = compare(pool, plus, minus, games, dimension, workers,
+                            seed + iteration*workers)
+            weights = weights + stepA * score / (2*stepC) * delta
+            print("iteration " + str(iteration) + ": score " + str(round(score, 3)) +
+                  " (" + str(round(time.perf_counter() - start, 2)) + " s)")
+    finally:
+        pool.close()
+        pool.join()
+    return patterns, weights
+
+
+#> Writes the tuned ranking in the form Logic.loadPatternRanking() reads.
+def writeRanking(path, patterns, weights):
+    ranking = {"HARDPATS": rankPatterns(patterns, weights), "weights": {}}
+    for indx in range(len(patterns)):
+        ranking["weights"][patterns[indx]] = round(float(weights[indx]), 4)
+    rankingFile = open(path, "w")
+    json.dump(ranking, rankingFile, indent=1)
+    rankingFile.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune pattern priorities by self-play")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--games", type=int, default=256, help="games per iteration")
+    parser.add_argument("--dimension", type=int, default=15)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="gomoku_Ranking.json")
+    args = parser.parse_args(argv)
+
+    patterns, weights = tune(args.iterations, args.games, args.dimension, args.workers)
+    writeRanking(args.out, patterns, weights)
+    print("Wrote tuned ranking to " + args.out)
+
+
+if __name__ == "__main__":
+    main()